@@ -0,0 +1,96 @@
+#
+# Created on Oct. 2026
+#
+# Lightweight appearance descriptors of the persons (hue-saturation histograms
+# of the torso and legs), and a bounded cache of the recently lost tracks,
+# to recognize them when they reappear without any neural inference.
+
+__author__ = '@naxvm'
+
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from Actuation.association import associate
+
+H_BINS, S_BINS = 8, 4
+PARTS = ((0.2, 0.55), (0.55, 0.95))  # torso and legs (vertical ratios of the box)
+SAMPLES = 16                         # samples per side on each part
+DESCRIPTOR_SIZE = len(PARTS) * H_BINS * S_BINS
+LRU_SIZE = 16                        # lost tracks kept on the cache
+MATCH_THR = 0.3                      # maximum (Bhattacharyya) distance to recognize a lost track
+DESCRIPTOR_MEMORY = 0.8              # weight of the previous descriptor when a track is updated
+
+
+def binImage(image):
+    """Quantize an RGB image into the hue-saturation bins of the histograms (done once per frame)."""
+    hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+    hue = hsv[..., 0].astype(np.uint16) * H_BINS // 180
+    sat = hsv[..., 1].astype(np.uint16) * S_BINS // 256
+    return (hue * S_BINS + sat).astype(np.uint8)
+
+
+def describe(bins, boxes):
+    """(N, DESCRIPTOR_SIZE) descriptors of the [x, y, w, h] boxes on a binned image:
+    a normalized histogram per part, sampled on a regular grid for all the boxes at once."""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    n_boxes = len(boxes)
+    im_h, im_w = bins.shape
+    steps = (np.arange(SAMPLES, dtype=np.float32) + 0.5) / SAMPLES
+    n_bins = H_BINS * S_BINS
+
+    histograms = np.zeros((n_boxes, len(PARTS), n_bins), dtype=np.float32)
+    if n_boxes == 0:
+        return histograms.reshape(0, DESCRIPTOR_SIZE)
+    cols = np.clip(boxes[:, 0:1] + steps[None, :] * boxes[:, 2:3], 0, im_w - 1).astype(int)
+    for part, (top, bottom) in enumerate(PARTS):
+        ratios = top + steps * (bottom - top)
+        rows = np.clip(boxes[:, 1:2] + ratios[None, :] * boxes[:, 3:4], 0, im_h - 1).astype(int)
+        samples = bins[rows[:, :, None], cols[:, None, :]].reshape(n_boxes, -1)
+        # One bincount for every box (offset by box)
+        offsets = np.arange(n_boxes)[:, None] * n_bins
+        counts = np.bincount((samples + offsets).ravel(), minlength=n_boxes * n_bins)
+        histograms[:, part] = counts.reshape(n_boxes, n_bins) / samples.shape[1]
+    return histograms.reshape(n_boxes, DESCRIPTOR_SIZE)
+
+
+def distances(descs_a, descs_b):
+    """(N, M) Bhattacharyya distances between descriptors, averaged over the parts."""
+    descs_a = descs_a.reshape(len(descs_a), len(PARTS), -1)
+    descs_b = descs_b.reshape(len(descs_b), len(PARTS), -1)
+    coeffs = np.einsum('npk,mpk->nmp', np.sqrt(descs_a), np.sqrt(descs_b))
+    return np.sqrt(np.clip(1 - coeffs, 0, None)).mean(axis=2)
+
+
+class AppearanceCache:
+    """LRU of the descriptors of the lost tracks, by track id."""
+
+    def __init__(self, size=LRU_SIZE, threshold=MATCH_THR):
+        self.size = size
+        self.threshold = threshold
+        self.entries = OrderedDict()  # track id -> (descriptor, was the reference)
+
+    def put(self, track_id, descriptor, is_ref=False):
+        self.entries[track_id] = (descriptor.copy(), is_ref)
+        self.entries.move_to_end(track_id)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def pop(self, track_id):
+        return self.entries.pop(track_id, None)
+
+    def match(self, descriptors):
+        """Recognize lost tracks among some descriptors (one-to-one). Return the
+        (descriptor index, track id, was the reference) of the recognized ones
+        (removed from the cache) and the indices of the rest."""
+        if len(self.entries) == 0 or len(descriptors) == 0:
+            return [], list(range(len(descriptors)))
+        track_ids = list(self.entries.keys())
+        cached = np.stack([self.entries[track_id][0] for track_id in track_ids])
+        matches, unmatched, _ = associate(distances(descriptors, cached), self.threshold)
+        recognized = []
+        for desc_idx, cache_idx in matches:
+            _, is_ref = self.entries.pop(track_ids[cache_idx])
+            recognized.append((desc_idx, track_ids[cache_idx], is_ref))
+        return recognized, unmatched
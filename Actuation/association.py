@@ -0,0 +1,115 @@
+#
+# Created on Oct. 2026
+#
+# Assignment of the detections to the tracks: the costs between all of them
+# are computed at once, and solved under a one-to-one constraint.
+
+__author__ = '@naxvm'
+
+import numpy as np
+from cprint import cprint
+from scipy.optimize import linear_sum_assignment
+
+SOLVERS = ['hungarian', 'greedy']
+METRICS = ['center', 'iou']
+# Values used when they are not provided on the PeopleTracker.Association YML node
+DEFAULT_ASSOCIATION_CFG = {
+    'Metric': 'center',     # cost between a detection and a track: distance between centers, or 1 - IoU
+    'Solver': 'hungarian',  # globally optimal assignment, or greedy by cost
+    'MinIoU': 0.3,          # gate of the 'iou' metric (the 'center' one is gated by SamePersonThr)
+}
+GATED_COST = 1e6  # cost given to the pairs out of the gate (so the solver avoids them)
+
+
+def centerDistances(boxes_a, boxes_b):
+    """(N, M) distances between the centers of the [x, y, w, h] boxes."""
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    centers_a = boxes_a[:, :2] + boxes_a[:, 2:] / 2
+    centers_b = boxes_b[:, :2] + boxes_b[:, 2:] / 2
+    return np.linalg.norm(centers_a[:, None, :] - centers_b[None, :, :], axis=2)
+
+
+def iouMatrix(boxes_a, boxes_b):
+    """(N, M) intersection over union between the [x, y, w, h] boxes."""
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 0] + boxes_a[:, None, 2], boxes_b[None, :, 0] + boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 1] + boxes_a[:, None, 3], boxes_b[None, :, 1] + boxes_b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    areas_a = boxes_a[:, 2] * boxes_a[:, 3]
+    areas_b = boxes_b[:, 2] * boxes_b[:, 3]
+    union = areas_a[:, None] + areas_b[None, :] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+def greedyAssignment(cost):
+    """Take the cheapest pairs first, while both elements are free."""
+    rows, cols = np.unravel_index(np.argsort(cost, axis=None), cost.shape)
+    used_rows, used_cols = set(), set()
+    matches = []
+    for row, col in zip(rows, cols):
+        if row in used_rows or col in used_cols:
+            continue
+        matches.append((row, col))
+        used_rows.add(row)
+        used_cols.add(col)
+        if len(matches) == min(cost.shape):
+            break
+    return matches
+
+
+def associate(cost, gate, solver='hungarian'):
+    """Match the rows (detections) with the columns (tracks) of a cost matrix,
+    one-to-one, discarding the pairs whose cost is above the gate.
+    Return the matched (row, col) pairs and the unmatched rows and columns."""
+    if solver not in SOLVERS:
+        cprint.fatal(f'Unknown association solver {solver} (choose among {SOLVERS})', interrupt=True)
+    n_rows, n_cols = cost.shape
+    matches = []
+    if n_rows > 0 and n_cols > 0:
+        gated = np.where(cost <= gate, cost, GATED_COST)
+        if solver == 'hungarian':
+            pairs = zip(*linear_sum_assignment(gated))
+        else:
+            pairs = greedyAssignment(gated)
+        matches = [(int(row), int(col)) for row, col in pairs if gated[row, col] < GATED_COST]
+
+    matched_rows = {row for row, _ in matches}
+    matched_cols = {col for _, col in matches}
+    unmatched_rows = [row for row in range(n_rows) if row not in matched_rows]
+    unmatched_cols = [col for col in range(n_cols) if col not in matched_cols]
+    return matches, unmatched_rows, unmatched_cols
+
+
+class Associator:
+    """Build the cost matrix between the detections and the tracks,
+    and assign them according to the configured metric and solver."""
+
+    def __init__(self, same_person_thr, association_cfg=None):
+        cfg = dict(DEFAULT_ASSOCIATION_CFG)
+        cfg.update(association_cfg or {})
+        if cfg['Metric'] not in METRICS:
+            cprint.fatal(f'Unknown association metric {cfg["Metric"]} (choose among {METRICS})', interrupt=True)
+        if cfg['Solver'] not in SOLVERS:
+            cprint.fatal(f'Unknown association solver {cfg["Solver"]} (choose among {SOLVERS})', interrupt=True)
+        self.metric = cfg['Metric']
+        self.solver = cfg['Solver']
+        if self.metric == 'center':
+            # SamePersonThr was tuned on the former box distance, which
+            # was half the distance between the centers of equal-size boxes
+            self.gate = 2 * same_person_thr
+        else:
+            self.gate = 1 - cfg['MinIoU']
+
+    def match(self, boxes, track_boxes):
+        """Assign the detected boxes to the tracks ones (both [x, y, w, h, ...])."""
+        boxes = [box[:4] for box in boxes]
+        track_boxes = [box[:4] for box in track_boxes]
+        if self.metric == 'center':
+            cost = centerDistances(boxes, track_boxes)
+        else:
+            cost = 1 - iouMatrix(boxes, track_boxes)
+        return associate(cost, self.gate, self.solver)
@@ -0,0 +1,88 @@
+#
+# Created on Oct. 2026
+#
+# Estimation of the global motion of the frame (caused by the camera moving,
+# on a mobile base or a PTZ), as a robust similarity transform fitted on the
+# background keypoints. The tracks are moved with it before predicting their
+# own motion, so their velocities only reflect the motion of the persons.
+
+__author__ = '@naxvm'
+
+import cv2
+import numpy as np
+from cprint import cprint
+
+# Values used when they are not provided on the PeopleTracker.EgoMotion YML node
+DEFAULT_EGO_MOTION_CFG = {
+    'Enabled': True,
+    'HFov': 1.0,           # horizontal field of view of the camera (rad), to convert the commands into pixels
+    'UseCommands': False,  # fall back on the commanded angular speed when the background can't be fitted
+}
+MIN_BACKGROUND = 15    # background keypoints required to fit the transform
+RANSAC_THR = 2.0       # px, reprojection error of the inliers
+MIN_INLIERS = 0.5      # minimum ratio of inliers to trust a fit
+IDENTITY = np.array([[1, 0, 0],
+                     [0, 1, 0]], dtype=np.float64)
+
+
+def warpPoints(points, transform):
+    """Apply a 2x3 transform to (N, 2) points."""
+    return points @ transform[:, :2].T + transform[:, 2]
+
+
+def warpBoxes(boxes, transform):
+    """Move (N, 4) [x, y, w, h] boxes with a 2x3 similarity transform (their centers, and their scale)."""
+    boxes = np.array(boxes, dtype=np.float32).reshape(-1, 4)
+    scale = np.sqrt(abs(np.linalg.det(transform[:, :2])))
+    centers = warpPoints(boxes[:, :2] + boxes[:, 2:] / 2, transform)
+    boxes[:, 2:] *= scale
+    boxes[:, :2] = centers - boxes[:, 2:] / 2
+    return boxes
+
+
+def warpStates(states, transform):
+    """Move (N, 4) [cx, cy, vx, vy] states with a 2x3 transform (rotating their velocities)."""
+    states = states.copy()
+    states[:, :2] = warpPoints(states[:, :2], transform)
+    states[:, 2:] = states[:, 2:] @ transform[:, :2].T
+    return states
+
+
+class EgoMotionEstimator:
+    """Fit the frame motion between two sets of tracked background keypoints,
+    optionally falling back on the motion expected from the commanded turn."""
+
+    def __init__(self, ego_motion_cfg=None, period=1/30):
+        cfg = dict(DEFAULT_EGO_MOTION_CFG)
+        cfg.update(ego_motion_cfg or {})
+        if not 0 < cfg['HFov'] < np.pi:
+            cprint.fatal(f'The EgoMotion HFov must be in (0, pi) rad, not {cfg["HFov"]}', interrupt=True)
+        self.enabled = cfg['Enabled']
+        self.hfov = cfg['HFov']
+        self.use_commands = cfg['UseCommands']
+        self.period = period
+        self.angular_speed = 0.0
+
+    def setCommand(self, angular_speed):
+        """Latest angular speed (rad/s, positive to the left) commanded to the robot."""
+        self.angular_speed = angular_speed
+
+    def commandTransform(self, im_width):
+        """Frame motion expected from the commanded turn: a horizontal shift (the
+        scene moves to the right when the robot turns to the left)."""
+        transform = IDENTITY.copy()
+        if self.use_commands:
+            focal = im_width / (2 * np.tan(self.hfov / 2))
+            transform[0, 2] = focal * np.tan(self.angular_speed * self.period)
+        return transform
+
+    def estimate(self, old_points, new_points, im_width):
+        """2x3 transform from the old to the new positions of the background keypoints."""
+        if not self.enabled:
+            return IDENTITY.copy()
+        if len(old_points) >= MIN_BACKGROUND:
+            transform, inliers = cv2.estimateAffinePartial2D(old_points, new_points, method=cv2.RANSAC,
+                                                             ransacReprojThreshold=RANSAC_THR)
+            if transform is not None and inliers.mean() >= MIN_INLIERS:
+                return transform
+        return self.commandTransform(im_width)
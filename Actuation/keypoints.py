@@ -0,0 +1,119 @@
+#
+# Created on Oct. 2026
+#
+# Keypoints maintenance for the people tracker: the LK survivors are kept
+# between frames, and new ones are only searched where they were lost.
+
+__author__ = '@naxvm'
+
+import cv2
+import numpy as np
+
+from Actuation.spatial_index import KeypointGrid
+
+KPS_PER_TRACK = 40       # keypoints budget inside each tracked box
+REFILL_RATIO = 0.5       # a box is replenished when it keeps less than this fraction of its budget
+BACKGROUND_KPS = 60      # keypoints budget outside the tracked boxes
+BOX_MARGIN = 0.1         # relative margin around the boxes where the new keypoints are searched
+FB_THRESHOLD = 1.0       # px, maximum forward-backward error of a tracked keypoint
+
+
+def pyramidsSupported():
+    """Check if calcOpticalFlowPyrLK accepts prebuilt pyramids on this OpenCV build
+    (the Python bindings of some versions only take plain images)."""
+    image = np.zeros((32, 32), dtype=np.uint8)
+    _, pyramid = cv2.buildOpticalFlowPyramid(image, (5, 5), 0)
+    try:
+        cv2.calcOpticalFlowPyrLK(pyramid, pyramid, np.zeros((1, 2), dtype=np.float32), None,
+                                 winSize=(5, 5), maxLevel=0)
+    except cv2.error:
+        return False
+    return True
+
+
+PYRAMIDS_SUPPORTED = pyramidsSupported()
+
+
+class KeypointManager:
+    """Keep the keypoints tracked by LK between frames, pruning the unreliable
+    ones (forward-backward check), and only detecting new keypoints in the
+    regions which lost them, instead of re-detecting on the full image."""
+
+    def __init__(self, feature_params, lk_params, per_track=KPS_PER_TRACK, background=BACKGROUND_KPS,
+                 margin=BOX_MARGIN, fb_threshold=FB_THRESHOLD):
+        self.feature_params = dict(feature_params)
+        self.lk_params = lk_params
+        self.per_track = per_track
+        self.background = background
+        self.margin = margin
+        self.fb_threshold = fb_threshold
+
+    def detect(self, gray, mask=None, max_corners=None):
+        """Find new keypoints on the (masked) image."""
+        params = dict(self.feature_params)
+        if max_corners is not None:
+            params['maxCorners'] = int(max_corners)
+        keypoints = cv2.goodFeaturesToTrack(gray, mask=mask, **params)
+        if keypoints is None:
+            return np.zeros((0, 2), dtype=np.float32)
+        return keypoints.reshape(-1, 2)
+
+    def buildPyramid(self, gray):
+        """Build the LK pyramid of a frame once, to be reused by every
+        optical flow call involving it (as previous or next image).
+        The image itself is returned if the pyramids can't be reused."""
+        if not PYRAMIDS_SUPPORTED:
+            return gray
+        _, pyramid = cv2.buildOpticalFlowPyramid(gray, self.lk_params['winSize'], self.lk_params['maxLevel'])
+        return pyramid
+
+    def track(self, prev_pyr, pyr, keypoints):
+        """Track the keypoints into the new frame (both given as pyramids, or plain
+        grayscale images). Return the old and new positions of those found in both
+        directions with a low forward-backward error."""
+        if len(keypoints) == 0:
+            return keypoints, keypoints
+        new_kps, status, _ = cv2.calcOpticalFlowPyrLK(prev_pyr, pyr, keypoints, None, **self.lk_params)
+        back_kps, back_status, _ = cv2.calcOpticalFlowPyrLK(pyr, prev_pyr, new_kps, None, **self.lk_params)
+
+        fb_error = np.linalg.norm(keypoints - back_kps, axis=1)
+        found = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error < self.fb_threshold)
+        return keypoints[found], new_kps[found]
+
+    def replenish(self, gray, keypoints, boxes):
+        """Add keypoints to the boxes ([x, y, w, h]) below their budget,
+        and to the background if it is below its own one."""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        im_h, im_w = gray.shape[:2]
+        box_idx, kp_idx = KeypointGrid(keypoints, (im_w, im_h)).queryBoxes(boxes)
+        counts = np.bincount(box_idx, minlength=len(boxes))
+
+        # Margin around every box
+        mx, my = self.margin * boxes[:, 2], self.margin * boxes[:, 3]
+        x1 = np.clip(boxes[:, 0] - mx, 0, im_w).astype(int)
+        y1 = np.clip(boxes[:, 1] - my, 0, im_h).astype(int)
+        x2 = np.clip(boxes[:, 0] + boxes[:, 2] + mx, 0, im_w).astype(int)
+        y2 = np.clip(boxes[:, 1] + boxes[:, 3] + my, 0, im_h).astype(int)
+        keypoints = np.asarray(keypoints, dtype=np.float32).reshape(-1, 2)
+        n_background = len(keypoints) - len(np.unique(kp_idx))
+        for idx in np.where(counts < REFILL_RATIO * self.per_track)[0]:
+            if x2[idx] <= x1[idx] or y2[idx] <= y1[idx]:
+                continue
+            # Detected on the box alone, so it gets its own budget (and corner quality scale)
+            new_kps = self.detect(gray[y1[idx]:y2[idx], x1[idx]:x2[idx]], max_corners=self.per_track - counts[idx])
+            keypoints = self.merge(keypoints, new_kps + np.array([x1[idx], y1[idx]], dtype=np.float32))
+
+        if n_background < REFILL_RATIO * self.background:
+            # Search the background too (outside every box)
+            bg_mask = np.full((im_h, im_w), 255, dtype=np.uint8)
+            for idx in range(len(boxes)):
+                bg_mask[y1[idx]:y2[idx], x1[idx]:x2[idx]] = 0
+            keypoints = self.merge(keypoints, self.detect(gray, bg_mask, max_corners=self.background - n_background))
+        return keypoints
+
+    def merge(self, keypoints, new_kps):
+        """Add the new keypoints which are not too close to the existing ones."""
+        if len(keypoints) > 0 and len(new_kps) > 0:
+            dists = np.linalg.norm(new_kps[:, None, :] - keypoints[None, :, :], axis=2)
+            new_kps = new_kps[dists.min(axis=1) >= self.feature_params['minDistance']]
+        return np.vstack((keypoints, new_kps)).astype(np.float32)
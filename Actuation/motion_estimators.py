@@ -0,0 +1,301 @@
+#
+# Created on Oct. 2026
+#
+# Interchangeable estimators of the motion between consecutive frames for
+# the people tracker: sparse Lucas-Kanade on the maintained keypoints, dense
+# DIS optical flow at low resolution, and MOSSE correlation filters on the
+# track crops (all of them filtered at once in the frequency domain).
+
+__author__ = '@naxvm'
+
+import cv2
+import numpy as np
+from cprint import cprint
+
+from Actuation.association import iouMatrix
+from Actuation.keypoints import KeypointManager
+from Actuation.spatial_index import KeypointGrid
+from Actuation.tracking_classes import tracksMotion
+
+FEATURE_PARAMS = dict(maxCorners=300,
+                      qualityLevel=0.1,
+                      minDistance=7,
+                      blockSize=7)
+
+LK_PARAMS = dict(winSize=(25, 25),
+                 maxLevel=2,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+# Values used when they are not provided on the PeopleTracker.Motion YML node
+DEFAULT_MOTION_CFG = {
+    'Estimator': 'lk',  # see ESTIMATORS
+}
+
+DIS_DOWNSCALE = 4      # the dense flow is computed on the image downscaled by this factor
+DIS_STRIDE = 2         # px (on the downscaled flow) between the sampled flow vectors
+MOSSE_PATCH = 64       # px, side of the (resampled) crops of the correlation filters
+MOSSE_CONTEXT = 1.5    # crops side relative to the box side
+MOSSE_SIGMA = 2.0      # px, std of the desired (gaussian) correlation peak
+MOSSE_RATE = 0.125     # learning rate of the filters
+MOSSE_LAMBDA = 1e-2    # regularization of the filters
+MOSSE_PSR = 6.0        # minimum peak-to-sidelobe ratio of a reliable response
+MOSSE_MIN_IOU = 0.5    # overlap to a filtered box required to share its motion
+
+
+class PointsMotion:
+    """Motion between two frames given by point correspondences (old and new
+    positions), indexed on a grid over the old ones."""
+
+    def __init__(self, old_points, new_points, im_size):
+        self.old_points = old_points
+        self.new_points = new_points
+        self.grid = KeypointGrid(old_points, im_size)
+
+    def boxesMotion(self, boxes):
+        """Displacements, spread ratios and validity of the [x, y, w, h] boxes (see tracksMotion),
+        and the (old, new) correspondences out of every box (the background)."""
+        members = self.grid.queryBoxes(boxes)
+        avg_displs, std_ratios, valid = tracksMotion(boxes, self.old_points, self.new_points, members)
+        background = np.ones(len(self.old_points), dtype=bool)
+        background[members[1]] = False
+        return avg_displs, std_ratios, valid, (self.old_points[background], self.new_points[background])
+
+
+class BoxesMotion:
+    """Motion between two frames given by the displacements of some boxes. Any other
+    box overlapping one of them moves like it, and the rest are not valid."""
+
+    def __init__(self, boxes, displs, valid):
+        self.boxes = boxes
+        self.displs = displs
+        self.valid = valid
+
+    def boxesMotion(self, boxes):
+        """Same outputs as PointsMotion.boxesMotion (without scale changes nor background)."""
+        n_boxes = len(boxes)
+        avg_displs = np.zeros((n_boxes, 2))
+        std_ratios = np.full((n_boxes, 2), np.nan)
+        valid = np.zeros(n_boxes, dtype=bool)
+        if n_boxes > 0 and len(self.boxes) > 0:
+            ious = iouMatrix(boxes, self.boxes)
+            best = ious.argmax(axis=1)
+            valid = (ious.max(axis=1) >= MOSSE_MIN_IOU) & self.valid[best]
+            avg_displs[valid] = self.displs[best[valid]]
+        no_points = np.zeros((0, 2), dtype=np.float32)
+        return avg_displs, std_ratios, valid, (no_points, no_points)
+
+
+class MotionEstimator:
+    """Interface of the motion estimators. Each one keeps what it needs from the
+    previous frame, and returns the motion of every step (see PointsMotion)."""
+
+    # Points to display on the snapshots
+    keypoints = np.zeros((0, 2), dtype=np.float32)
+
+    def setPrior(self, gray):
+        """Set the first grayscale frame."""
+        raise NotImplementedError
+
+    def step(self, gray, boxes, track_ids):
+        """Estimate the motion from the previous frame to a new one, where the tracks
+        (with their ids) were on the [x, y, w, h] boxes."""
+        raise NotImplementedError
+
+    def replenish(self, boxes):
+        """Prepare the next step once the tracks were moved to the boxes."""
+        pass
+
+    def configure(self, settings):
+        """Adopt new cost/quality settings (see step_budget.LEVELS), if they apply to this
+        estimator. Return whether they were applied."""
+        return False
+
+
+class LKEstimator(MotionEstimator):
+    """Sparse Lucas-Kanade on the keypoints kept by a KeypointManager."""
+
+    def __init__(self, feature_params=FEATURE_PARAMS, lk_params=LK_PARAMS):
+        self.kp_manager = KeypointManager(feature_params, lk_params)
+        self.gray = None
+        self.pyramid = None
+
+    def setPrior(self, gray):
+        self.gray = gray
+        self.pyramid = self.kp_manager.buildPyramid(gray)
+        self.keypoints = self.kp_manager.detect(gray)
+
+    def step(self, gray, boxes, track_ids):
+        # The pyramid of the previous frame is cached, so only the new one is built
+        pyramid = self.kp_manager.buildPyramid(gray)
+        # Retain only the keypoints found (forward and backward)
+        old_found, new_found = self.kp_manager.track(self.pyramid, pyramid, self.keypoints)
+        self.gray, self.pyramid, self.keypoints = gray, pyramid, new_found
+        return PointsMotion(old_found, new_found, (gray.shape[1], gray.shape[0]))
+
+    def replenish(self, boxes):
+        """Add new keypoints only on the tracks (and background) which lost them."""
+        self.keypoints = self.kp_manager.replenish(self.gray, self.keypoints, boxes)
+
+    def configure(self, settings):
+        """Change the keypoint budgets and the LK window and pyramid levels."""
+        manager = self.kp_manager
+        manager.per_track = settings['KpsPerTrack']
+        manager.background = settings['BackgroundKps']
+        manager.feature_params['minDistance'] = settings['MinDistance']
+        manager.lk_params = dict(manager.lk_params, winSize=(settings['WinSize'],) * 2,
+                                 maxLevel=settings['MaxLevel'])
+        if self.gray is not None:
+            # The cached pyramid must match the new window and levels
+            self.pyramid = manager.buildPyramid(self.gray)
+        return True
+
+
+class DISEstimator(MotionEstimator):
+    """Dense DIS optical flow on the downscaled frames, sampled on a regular lattice."""
+
+    def __init__(self, downscale=DIS_DOWNSCALE, stride=DIS_STRIDE):
+        self.dis = cv2.DISOpticalFlow_create(cv2.DISOPTICAL_FLOW_PRESET_ULTRAFAST)
+        self.downscale = downscale
+        self.stride = stride
+        self.small = None
+        self.lattice = None
+
+    def shrink(self, gray):
+        return cv2.resize(gray, None, fx=1/self.downscale, fy=1/self.downscale, interpolation=cv2.INTER_AREA)
+
+    def setPrior(self, gray):
+        self.small = self.shrink(gray)
+        # Full resolution positions of the sampled flow vectors
+        rows, cols = np.mgrid[0:self.small.shape[0]:self.stride, 0:self.small.shape[1]:self.stride]
+        self.lattice = ((np.stack((cols, rows), axis=-1).reshape(-1, 2) + 0.5) * self.downscale
+                        - 0.5).astype(np.float32)
+
+    def step(self, gray, boxes, track_ids):
+        small = self.shrink(gray)
+        flow = self.dis.calc(self.small, small, None)
+        self.small = small
+        displs = flow[::self.stride, ::self.stride].reshape(-1, 2) * self.downscale
+        return PointsMotion(self.lattice, self.lattice + displs, (gray.shape[1], gray.shape[0]))
+
+
+def samplePatches(gray, boxes, size, context):
+    """(N, size, size) bilinear resampling of the regions around the [x, y, w, h] boxes
+    (context times their size, around their centers), for every box at once."""
+    im_h, im_w = gray.shape
+    steps = (np.arange(size) + 0.5) / size - 0.5
+    centers = boxes[:, :2] + boxes[:, 2:] / 2
+    xs = np.clip(centers[:, 0:1] + steps[None, :] * context * boxes[:, 2:3], 0, im_w - 1)
+    ys = np.clip(centers[:, 1:2] + steps[None, :] * context * boxes[:, 3:4], 0, im_h - 1)
+    x0 = np.minimum(xs.astype(int), im_w - 2)
+    y0 = np.minimum(ys.astype(int), im_h - 2)
+    fx, fy = (xs - x0)[:, None, :], (ys - y0)[:, :, None]
+    rows, cols = y0[:, :, None], x0[:, None, :]
+    top = gray[rows, cols] * (1 - fx) + gray[rows, cols + 1] * fx
+    bottom = gray[rows + 1, cols] * (1 - fx) + gray[rows + 1, cols + 1] * fx
+    return top * (1 - fy) + bottom * fy
+
+
+class MOSSEEstimator(MotionEstimator):
+    """MOSSE correlation filters, one per track (by id), on resampled crops around
+    their boxes. The filtering and updates of all the tracks are batched FFTs."""
+
+    def __init__(self, patch=MOSSE_PATCH, context=MOSSE_CONTEXT, rate=MOSSE_RATE):
+        self.patch = patch
+        self.context = context
+        self.rate = rate
+        self.gray = None
+        self.filters = {}  # track id -> (numerator, denominator)
+        window = np.hanning(patch)
+        self.window = np.outer(window, window)
+        # Desired response: a gaussian peak at the center of the crop
+        coords = np.arange(patch) - patch // 2
+        peak = np.exp(-(coords[:, None]**2 + coords[None, :]**2) / (2 * MOSSE_SIGMA**2))
+        self.target = np.fft.fft2(peak)
+
+    def spectra(self, gray, boxes):
+        """Normalized and windowed crops of the boxes, in the frequency domain."""
+        patches = np.log1p(samplePatches(gray, boxes, self.patch, self.context))
+        patches -= patches.mean(axis=(1, 2), keepdims=True)
+        patches /= patches.std(axis=(1, 2), keepdims=True) + 1e-5
+        return np.fft.fft2(patches * self.window)
+
+    def learn(self, spectra):
+        return self.target * np.conj(spectra), spectra * np.conj(spectra)
+
+    def setPrior(self, gray):
+        self.gray = gray.astype(np.float32)
+        self.filters = {}
+
+    def step(self, gray, boxes, track_ids):
+        gray = gray.astype(np.float32)
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        track_ids = [int(track_id) for track_id in track_ids]
+        n_boxes = len(boxes)
+        displs = np.zeros((n_boxes, 2))
+        valid = np.zeros(n_boxes, dtype=bool)
+        if n_boxes > 0:
+            # Start the filters of the new tracks on the previous frame
+            new = [idx for idx, track_id in enumerate(track_ids) if track_id not in self.filters]
+            if new:
+                numerators, denominators = self.learn(self.spectra(self.gray, boxes[new]))
+                for idx, num, den in zip(new, numerators, denominators):
+                    self.filters[track_ids[idx]] = (num, den)
+            numerators = np.stack([self.filters[track_id][0] for track_id in track_ids])
+            denominators = np.stack([self.filters[track_id][1] for track_id in track_ids])
+
+            # Correlate every filter with the crop of its box on the new frame
+            responses = np.real(np.fft.ifft2(numerators / (denominators + MOSSE_LAMBDA)
+                                             * self.spectra(gray, boxes)))
+            flat_peaks = responses.reshape(n_boxes, -1).argmax(axis=1)
+            peak_rows, peak_cols = np.unravel_index(flat_peaks, responses.shape[1:])
+            peaks = responses.reshape(n_boxes, -1)[np.arange(n_boxes), flat_peaks]
+            # Peak-to-sidelobe ratio (out of an 11x11 window around the peak)
+            coords = np.arange(self.patch)
+            sidelobe = ((np.abs(coords[None, :, None] - peak_rows[:, None, None]) > 5)
+                        | (np.abs(coords[None, None, :] - peak_cols[:, None, None]) > 5))
+            n_side = sidelobe.sum(axis=(1, 2))
+            side_mean = (responses * sidelobe).sum(axis=(1, 2)) / n_side
+            side_std = np.sqrt(((responses - side_mean[:, None, None])**2 * sidelobe).sum(axis=(1, 2)) / n_side)
+            valid = (peaks - side_mean) / (side_std + 1e-5) >= MOSSE_PSR
+
+            # Offset of the peaks (on the crops) scaled back to the image
+            offsets = np.stack((peak_cols, peak_rows), axis=1) - self.patch // 2
+            displs = offsets * self.context * boxes[:, 2:] / self.patch
+            displs[~valid] = 0
+
+            # Adapt the filters to the crops on their new positions
+            moved = boxes.copy()
+            moved[:, :2] += displs
+            new_nums, new_dens = self.learn(self.spectra(gray, moved))
+            for idx, track_id in enumerate(track_ids):
+                if valid[idx]:
+                    self.filters[track_id] = ((1 - self.rate) * numerators[idx] + self.rate * new_nums[idx],
+                                              (1 - self.rate) * denominators[idx] + self.rate * new_dens[idx])
+        # Forget the filters of the tracks which are not alive anymore
+        self.filters = {track_id: self.filters[track_id] for track_id in track_ids}
+        self.gray = gray
+        return BoxesMotion(boxes, displs, valid)
+
+
+ESTIMATORS = {
+    'lk': LKEstimator,
+    'dis': DISEstimator,
+    'mosse': MOSSEEstimator,
+}
+# Known limitations of some estimators, warned about when they are chosen
+LIMITATIONS = {
+    'dis': 'its downscaled flow underestimates the motion of small or low-textured persons, '
+           'so their tracks lag behind them between detections',
+}
+
+
+def createEstimator(motion_cfg=None):
+    """Instantiate the motion estimator set on a PeopleTracker.Motion YML node."""
+    cfg = dict(DEFAULT_MOTION_CFG)
+    cfg.update(motion_cfg or {})
+    if cfg['Estimator'] not in ESTIMATORS:
+        cprint.fatal(f'Unknown motion estimator {cfg["Estimator"]} (choose among {list(ESTIMATORS)})',
+                     interrupt=True)
+    if cfg['Estimator'] in LIMITATIONS:
+        cprint.warn(f'Motion estimator {cfg["Estimator"]}: {LIMITATIONS[cfg["Estimator"]]}')
+    return ESTIMATORS[cfg['Estimator']]()
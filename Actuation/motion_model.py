@@ -0,0 +1,74 @@
+#
+# Created on Oct. 2026
+#
+# Constant-velocity Kalman filter on the center of the tracked boxes. The
+# keypoint displacements move the centers (as a control input) and the
+# detections re-anchor them. The states of all the tracks are stacked, so
+# every step is a single batched matrix operation.
+
+__author__ = '@naxvm'
+
+import numpy as np
+
+# Noise parameters (px, and frames as time unit)
+ACCEL_NOISE = 1.0     # std of the unmodelled acceleration (px/frame²)
+KP_NOISE = 2.0        # std of the displacement measured from the keypoints on each frame
+DET_NOISE = 8.0       # std of the center of a detection
+INIT_VEL_NOISE = 10.0 # std of the initial (unknown) velocity
+
+# State: [cx, cy, vx, vy]
+TRANSITION = np.array([[1, 0, 1, 0],
+                       [0, 1, 0, 1],
+                       [0, 0, 1, 0],
+                       [0, 0, 0, 1]], dtype=np.float64)
+VELOCITY_OBSERVATION = np.array([[0, 0, 1, 0],
+                                 [0, 0, 0, 1]], dtype=np.float64)
+# Discrete white-noise acceleration model (dt = 1 frame)
+PROCESS_NOISE = ACCEL_NOISE**2 * np.array([[0.25, 0, 0.5, 0],
+                                           [0, 0.25, 0, 0.5],
+                                           [0.5, 0, 1, 0],
+                                           [0, 0.5, 0, 1]], dtype=np.float64)
+# Moving by the keypoint displacements: their error accumulates on the
+# positions (until a detection re-anchors them), and the velocities drift
+DISPLACEMENT_NOISE = np.diag([KP_NOISE**2, KP_NOISE**2, ACCEL_NOISE**2, ACCEL_NOISE**2])
+
+
+def initState(coords):
+    """Initial state and covariance of a [x, y, w, h] box (centered, at rest)."""
+    state = np.array([coords[0] + coords[2] / 2, coords[1] + coords[3] / 2, 0, 0], dtype=np.float64)
+    cov = np.diag([DET_NOISE**2, DET_NOISE**2, INIT_VEL_NOISE**2, INIT_VEL_NOISE**2])
+    return state, cov
+
+
+def predict(states, covs):
+    """Propagate (N, 4) states and (N, 4, 4) covariances one frame forward."""
+    states = states @ TRANSITION.T
+    covs = TRANSITION @ covs @ TRANSITION.T + PROCESS_NOISE
+    return states, covs
+
+
+def displace(states, covs, displs):
+    """Propagate (N, 4) states and (N, 4, 4) covariances one frame forward with the (N, 2)
+    displacements measured from their keypoints. Those are relative measurements: the
+    centers are moved by them (as a control input), and they correct the velocities."""
+    states = states.copy()
+    states[:, :2] += displs
+    covs = covs + DISPLACEMENT_NOISE
+    innovation = displs - states @ VELOCITY_OBSERVATION.T
+    S = VELOCITY_OBSERVATION @ covs @ VELOCITY_OBSERVATION.T + KP_NOISE**2 * np.eye(2)
+    gains = covs @ VELOCITY_OBSERVATION.T @ np.linalg.inv(S)
+    states = states + (gains @ innovation[..., None])[..., 0]
+    covs = (np.eye(4) - gains @ VELOCITY_OBSERVATION) @ covs
+    return states, covs
+
+
+def anchor(states, covs, centers):
+    """Re-anchor the (N, 4) states on (N, 2) detected centers, discarding the drift
+    accumulated since the previous detection (the velocities are kept)."""
+    states = states.copy()
+    states[:, :2] = centers
+    covs = covs.copy()
+    covs[:, :2, :] = 0
+    covs[:, :, :2] = 0
+    covs[:, 0, 0] = covs[:, 1, 1] = DET_NOISE**2
+    return states, covs
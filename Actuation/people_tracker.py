@@ -1,139 +1,216 @@
 import cv2
 import threading
 import time
+from collections import deque
 from datetime import datetime
 from cprint import cprint
 import utils
 from Actuation.tracking_classes import *
+from Actuation.association import Associator
+from Actuation.track_table import TrackTable, FACE_PATIENCE
+from Actuation.motion_estimators import createEstimator
+from Actuation.step_budget import BudgetController
+from Actuation.ego_motion import EgoMotionEstimator, IDENTITY, warpBoxes, warpStates
+from Actuation import appearance, motion_model
+from scheduler import RateScheduler, SequenceNotifier
 import numpy as np
 np.set_printoptions(precision=2)
-FEATURE_PARAMS = dict(maxCorners=300,
-                      qualityLevel=0.1,
-                      minDistance=7,
-                      blockSize=7)
-
-LK_PARAMS = dict(winSize=(25, 25),
-                 maxLevel=2,
-                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
-
 PERIOD = 1/30   # time elapsed between frames on a 30 fps sensor
+MOTION_HISTORY = 30  # frames of estimated motion kept to compensate late detections
 
 
 class PeopleTracker(threading.Thread):
     """This class creates a thread responsible of continuously tracking the detected persons
      in the image."""
 
-    def __init__(self, patience, ref_sim_thr, same_person_thr, debug=False):
+    def __init__(self, patience, ref_sim_thr, same_person_thr, association_cfg=None, ego_motion_cfg=None,
+                 motion_cfg=None, budget_cfg=None, trajectory_log=None, log_detections=False, debug=False):
         super(PeopleTracker, self).__init__()
         self.name = 'PeopleTrackerThread'
         self.daemon = True
         # Placeholders
-        self.persons = []
-        self.candidates = []
+        # The records of the confirmed tracks are passed to the trajectory log (if provided)
+        self.tracks = TrackTable(history_log=trajectory_log)
         self.tracked_counter = 0
-        self.keypoints = []
         self.image = []
-        self.gray_image = []
         self.depth = []
         # Parameters
         self.same_person_thr = same_person_thr
         self.ref_sim_thr = ref_sim_thr
         self.patience = patience
+        self.associator = Associator(same_person_thr, association_cfg)
+        # Appearance of the recently lost persons, to recognize them when they reappear
+        self.appearance = appearance.AppearanceCache()
         self.cam = None
+        self.im_size = (640, 480)
         self.frame_counter = 0
+        # Global motion of the frame (camera motion) on the latest step
+        self.ego_estimator = EgoMotionEstimator(ego_motion_cfg, PERIOD)
+        self.ego_motion = IDENTITY.copy()
+        # (frame, motion, ego motion) of the latest steps
+        self.motion_history = deque(maxlen=MOTION_HISTORY)
+        self.motion_estimator = createEstimator(motion_cfg)
+        # Adaptation of the step cost to a time budget (if provided), and the settings chosen by it
+        self.budget_controller = None
+        if budget_cfg is not None:
+            self.budget_controller = BudgetController(budget_cfg)
+            # Starting on its default level (only some estimators can change their settings)
+            if not self.motion_estimator.configure(self.budget_controller.settings):
+                cprint.warn(f'The {type(self.motion_estimator).__name__} can\'t adapt its settings: '
+                            f'the tracker time budget is disabled')
+                self.budget_controller = None
+        self.settings_changes = []
+        # (applied frame, computed frame, boxes, faces, similarities) of every update, for the offline replays
+        self.detection_log = [] if log_detections else None
         # self.faces = []
         # self.similarities = []
 
         self.is_activated = False
         self.lock = threading.Lock()
+        # Serializes the writers of the tracks (this thread and the networks one)
+        self.tracks_lock = threading.Lock()
+        self.snapshot = TrackerSnapshot(0, 0, (), np.zeros((0, 2)), self.image, self.depth, self.ego_motion)
+        # Notifiers for the consumers of the frames and the snapshots
+        self.frames = SequenceNotifier()
+        self.snapshots = SequenceNotifier()
+        self.scheduler = None
         self.debug = debug
 
     def setCam(self, cam):
         self.cam = cam
         self.image, self.depth = self.cam.getImages()
+        self.im_size = (self.image.shape[1], self.image.shape[0])
+        self.tracks.im_size = self.im_size
         self.frame_counter += 1
 
 
     def setPrior(self):
         """Set the first image on the tracker."""
-        self.gray_image = cv2.cvtColor(self.image, cv2.COLOR_RGB2GRAY)
-        keypoints = cv2.goodFeaturesToTrack(self.gray_image, **FEATURE_PARAMS)
-        self.keypoints = keypoints.reshape(-1, 2)
-        # self.keypoints = keypoints.squeeze()
+        self.motion_estimator.setPrior(cv2.cvtColor(self.image, cv2.COLOR_RGB2GRAY))
+
+    def replenish(self):
+        """Let the motion estimator prepare the next step (e.g. adding new keypoints where they were lost)."""
+        self.motion_estimator.replenish(self.tracks.boxes[self.tracks.slots()])
 
 
     def getImages(self):
         """Serve the latest available images from the Camera."""
         return self.image, self.depth
 
+    def getFrame(self):
+        """Serve the latest images together with their frame number."""
+        with self.lock:
+            return self.image, self.depth, self.frame_counter
+
+    def publish(self):
+        """Publish a new immutable snapshot of the tracks. The readers keep
+        using the previous one, so they never see a half-updated state."""
+        keypoints = np.array(self.motion_estimator.keypoints, dtype=np.float32).reshape(-1, 2)
+        keypoints.flags.writeable = False
+        persons = tuple(self.tracks.view(slot) for slot in self.tracks.slots(confirmed=True))
+        self.snapshot = TrackerSnapshot(self.snapshot.version + 1, self.frame_counter, persons, keypoints,
+                                        self.image, self.depth, self.ego_motion)
+        self.snapshots.publish()
+
+    def getSnapshot(self):
+        """Serve the latest snapshot of the tracks (a change on the version
+        indicates that something was updated since the previous one)."""
+        return self.snapshot
+
 
     def stepAll(self):
         """Propagate the candidate/tracked persons using the latest image."""
-        new_image = cv2.cvtColor(self.image, cv2.COLOR_RGB2GRAY)
-        new_kps, status, errors = cv2.calcOpticalFlowPyrLK(self.gray_image, new_image, self.keypoints, None,
-                                                           **LK_PARAMS)
-        # Retain only found keypoints
-        found_idx = status.squeeze() == 1
-        old_found = self.keypoints[found_idx]
-        new_found = new_kps[found_idx]
-
-        # And compute the individual displacements for each person
-        for candidate in self.candidates:
-            candidate.step(old_found, new_found)
-        for person in self.persons:
-            person.step(old_found, new_found)
-
-        # Update the reference frame and keypoints
-        self.gray_image = new_image
-        self.keypoints = new_kps
-
-    def updateWithDetections(self, boxes, faces, similarities):
-        """Reassign the person to the most suitable bounding box."""
-
-        for box in boxes:
-            pers_distances = np.array(list(map(lambda x: utils.distanceBetweenBoxes(box, x.coords), self.persons)))
-            cand_distances = np.array(list(map(lambda x: utils.distanceBetweenBoxes(box, x.coords), self.candidates)))
-
-            # Assign to the nearest person, or create one if required
-            near_pers = np.where(pers_distances <= self.same_person_thr)[0]
-            near_cand = np.where(cand_distances <= self.same_person_thr)[0]
-
-            if len(near_pers) > 0 and len(near_cand) == 0:
-                # Closest close person
-                lowest_idx = np.argmin(pers_distances[near_pers])
-                if isinstance(lowest_idx, np.ndarray):
-                    lowest_idx = lowest_idx[0]
-                self.persons[lowest_idx].coords = box
-                # The person is still found
-                self.persons[lowest_idx].counter = self.patience
-            elif len(near_cand) > 0 and len(near_pers) == 0:
-                # Closest close candidate
-                lowest_idx = np.argmin(cand_distances[near_cand])
-                if isinstance(lowest_idx, np.ndarray):
-                    lowest_idx = lowest_idx[0]
-                self.candidates[lowest_idx].coords = box
-                # The candidate is still found
-                self.candidates[lowest_idx].counter += 2
-            elif len(near_cand) > 0 and len(near_pers) > 0:
-                # Nearby candidate and persons. Pick the closest
-                min_dist_cand = min(cand_distances[near_cand])
-                min_dist_pers = min(pers_distances[near_pers])
-                if min_dist_cand < min_dist_pers:
-                    lowest_idx = np.argmin(cand_distances[near_cand])
-                    if isinstance(lowest_idx, np.ndarray):
-                        lowest_idx = lowest_idx[0]
-                    self.candidates[lowest_idx].coords = box
-                    self.candidates[lowest_idx].counter += 2
-                else:
-                    lowest_idx = np.argmin(pers_distances[near_pers])
-                    if isinstance(lowest_idx, np.ndarray):
-                        lowest_idx = lowest_idx[0]
-                    self.persons[lowest_idx].coords = box
-                    self.persons[lowest_idx].counter = self.patience
-            else:
-                # This detection can't be assigned to anyone. We create a new candidate
-                candidate = Person(box)
-                self.candidates.append(candidate)
+        slots = self.tracks.slots()
+        boxes = self.tracks.boxes[slots]
+        motion = self.motion_estimator.step(cv2.cvtColor(self.image, cv2.COLOR_RGB2GRAY), boxes,
+                                            self.tracks.ids[slots])
+        # Compute the individual displacements for every person at once. The
+        # correspondences out of every track describe the motion of the camera
+        avg_displs, std_ratios, valid, (old_background, new_background) = motion.boxesMotion(boxes)
+        self.ego_motion = self.ego_estimator.estimate(old_background, new_background, self.im_size[0])
+        # The lost tracks are moved along with the camera until they are re-associated
+        lost = np.flatnonzero(self.tracks.lost)
+        self.tracks.boxes[lost] = warpBoxes(self.tracks.boxes[lost], self.ego_motion)
+
+        if len(slots) > 0:
+            # Move every track along with the camera, and then by its own displacement (the
+            # estimated one, or its velocity for the tracks without a valid displacement)
+            moved = self.tracks.states[slots, :2] + avg_displs
+            states = warpStates(self.tracks.states[slots], self.ego_motion)
+            covs = self.tracks.covs[slots]
+            own_displs = moved - states[:, :2]
+            states[valid], covs[valid] = motion_model.displace(states[valid], covs[valid], own_displs[valid])
+            states[~valid], covs[~valid] = motion_model.predict(states[~valid], covs[~valid])
+            std_ratios[~valid] = np.nan
+            self.tracks.setStates(slots, states, covs, std_ratios=std_ratios)
+
+        # Store the motion, to propagate the detections computed on older frames
+        self.motion_history.append((self.frame_counter, motion, self.ego_motion))
+
+    def updateDepths(self):
+        """Sample the distance of every track at once on the current depth image."""
+        if len(self.depth) == 0:
+            return
+        slots = self.tracks.slots()
+        self.tracks.depths[slots] = utils.sampleDepths(self.tracks.boxes[slots], self.depth)
+
+    def updateWithDetections(self, boxes, faces, similarities, frame=None):
+        """Reassign the person to the most suitable bounding box. If the frame
+        where the detections were computed is provided, they are propagated
+        to the current one first."""
+        with self.tracks_lock:
+            if self.detection_log is not None:
+                self.detection_log.append((self.frame_counter, frame, [list(map(float, box)) for box in boxes],
+                                           [list(map(float, face)) for face in faces],
+                                           [float(sim) for sim in similarities]))
+            if frame is not None:
+                boxes, faces = self.compensateLatency(boxes, faces, frame)
+            self._updateWithDetections(boxes, faces, similarities)
+            self.publish()
+
+    def compensateLatency(self, boxes, faces, frame):
+        """Move the detections from the frame they were computed on to the
+        current one, accumulating the estimated displacements since then."""
+        boxes = [list(box) for box in boxes]
+        # Faces are [cx, cy, w, h, p]: propagate them as corner boxes
+        faces = [list(utils.center2Corner(face[:4])) + list(face[4:]) for face in faces]
+        n_boxes = len(boxes)
+        for step_frame, motion, ego_motion in self.motion_history:
+            if step_frame <= frame or n_boxes + len(faces) == 0:
+                continue
+            all_boxes = np.array([box[:4] for box in boxes + faces], dtype=np.float32)
+            avg_displs, std_ratios, valid, _ = motion.boxesMotion(all_boxes)
+            for idx, box in enumerate(boxes + faces):
+                if not valid[idx]:
+                    # Without a valid displacement, it just moves along with the camera
+                    box[:4] = warpBoxes(box[:4], ego_motion)[0]
+                    continue
+                # Too few keypoints on a face to estimate its scale reliably
+                std_ratio = std_ratios[idx] if idx < n_boxes and not np.isnan(std_ratios[idx, 0]) else None
+                moveBox(box, avg_displs[idx], std_ratio, self.im_size)
+        faces = [[face[0] + face[2]/2, face[1] + face[3]/2] + face[2:] for face in faces]
+        return boxes, faces
+
+    def _updateWithDetections(self, boxes, faces, similarities):
+        # Hue-saturation bins of the current frame, for the appearance descriptors
+        bins = appearance.binImage(self.image)
+        # Assign each detection to (at most) one person or candidate
+        slots = np.concatenate((self.tracks.slots(confirmed=True), self.tracks.slots(confirmed=False)))
+        matches, unmatched, _ = self.associator.match(boxes, self.tracks.boxes[slots])
+        if len(matches) > 0:
+            rows, cols = np.array(matches).T
+            matched = slots[cols]
+            det_boxes = np.array([boxes[row][:4] for row in rows], dtype=np.float32)
+            # The detections re-anchor the motion models of their tracks
+            centers = det_boxes[:, :2] + det_boxes[:, 2:] / 2
+            states, covs = motion_model.anchor(self.tracks.states[matched], self.tracks.covs[matched], centers)
+            self.tracks.setStates(matched, states, covs, boxes=det_boxes)
+            # The persons are still found, and the candidates get closer to be confirmed
+            self.tracks.counters[matched] = np.where(self.tracks.confirmed[matched], self.patience,
+                                                     self.tracks.counters[matched] + 2)
+            self.updateDescriptors(matched, appearance.describe(bins, det_boxes))
+        unmatched = self.reassociate([boxes[box_idx] for box_idx in unmatched])
+        self.recognize(unmatched, bins)
         # And refresh the present persons with the new information
         self.handleFaces(faces, similarities)
         self.checkRef()
@@ -142,95 +219,170 @@ class PeopleTracker(threading.Thread):
 
     def refresh(self):
         """Update the stored persons."""
-        new_persons = []
-        new_candidates = []
-        # Candidates:
-        for cand in self.candidates:
-            if cand.counter >= 0:
-                # Survive
-                if cand.counter >= self.patience/2:
-                    # The candidate will be a tracked person
-                    cand.counter = self.patience
-                    new_persons.append(cand)
-                else:
-                    # Still candidate
-                    cand.counter -= 1
-                    new_candidates.append(cand)
-        self.candidates = new_candidates
-
-        # Persons:
-        for person in self.persons:
-            if person.counter >= 0:
-                # Survive
-                person.counter -= 1
-                new_persons.append(person)
-        self.persons = new_persons
+        tracks = self.tracks
+        candidates = tracks.active & ~tracks.confirmed
+        persons = tracks.active & tracks.confirmed
+        dead = tracks.active & (tracks.counters < 0)
+        # The candidates found enough times will be tracked persons
+        promoted = candidates & ~dead & (tracks.counters >= self.patience/2)
+        # The rest (still candidates, and persons) lose patience
+        tracks.counters[(candidates | persons) & ~dead & ~promoted] -= 1
+        tracks.confirmed[promoted] = True
+        tracks.counters[promoted] = self.patience
+        self.tracked_counter += int(np.count_nonzero(promoted))
+        # The lost persons can still be re-associated for a while, and recognized by their appearance
+        lost = np.flatnonzero(dead & persons)
+        for slot in lost[tracks.has_descriptor[lost]]:
+            self.appearance.put(int(tracks.ids[slot]), tracks.descriptors[slot], bool(tracks.is_ref[slot]))
+        tracks.lose(lost, self.frame_counter)
+        tracks.remove(np.flatnonzero(dead & candidates))
 
-    def handleFaces(self, faces, similarities):
-        """Check if a detected face belongs (spatially) to a person, and track it. Discard it otherwise."""
-        for face, sim in zip(faces, similarities):
-            face_std = utils.center2Corner(face)
-            for person in self.persons:
-                if bb1inbb2(face_std, person.coords):
-                    # The face is inside this person's box.
-                    person.setFace(face, sim)
+    def reassociate(self, boxes):
+        """Resume the recently lost persons (e.g. after a short occlusion) whose extrapolated
+        boxes match some of the unassigned detections. Return the remaining detections."""
+        slots, predicted = self.tracks.lostPredictions(self.frame_counter)
+        if len(boxes) == 0 or len(slots) == 0:
+            return boxes
+        matches, unmatched, _ = self.associator.match(boxes, predicted)
+        for box_idx, lost_idx in matches:
+            self.tracks.revive(slots[lost_idx], boxes[box_idx])
+            self.tracks.counters[slots[lost_idx]] = self.patience
+            self.appearance.pop(int(self.tracks.ids[slots[lost_idx]]))
+        return [boxes[box_idx] for box_idx in unmatched]
 
+    def recognize(self, boxes, bins):
+        """Resume the lost persons (even after the re-association window) whose appearance
+        matches some of the unassigned detections, and create new candidates with the rest."""
+        if len(boxes) == 0:
+            return
+        descriptors = appearance.describe(bins, [box[:4] for box in boxes])
+        recognized, unmatched = self.appearance.match(descriptors)
+        for box_idx, track_id, was_ref in recognized:
+            lost = np.flatnonzero(self.tracks.lost & (self.tracks.ids == track_id))
+            if len(lost) > 0:
+                slot = lost[0]
+                self.tracks.revive(slot, boxes[box_idx])
+            else:
+                # Its slot was already freed: it is tracked again under the same id
+                slot = self.tracks.add(boxes[box_idx], track_id=track_id)
+                self.tracks.confirmed[slot] = True
+            self.tracks.counters[slot] = self.patience
+            # It is the reference again, unless another person took its place meanwhile
+            self.tracks.is_ref[slot] = was_ref and not self.tracks.is_ref[self.tracks.slots(confirmed=True)].any()
+            self.updateDescriptors([slot], descriptors[[box_idx]])
+        for box_idx in unmatched:
+            # This detection can't be assigned to anyone. We create a new candidate
+            slot = self.tracks.add(boxes[box_idx])
+            self.updateDescriptors([slot], descriptors[[box_idx]])
+
+    def updateDescriptors(self, slots, descriptors):
+        """Blend new appearance descriptors into the ones of the given tracks."""
+        slots = np.asarray(slots, dtype=int)
+        previous = self.tracks.descriptors[slots]
+        blended = appearance.DESCRIPTOR_MEMORY * previous + (1 - appearance.DESCRIPTOR_MEMORY) * descriptors
+        self.tracks.descriptors[slots] = np.where(self.tracks.has_descriptor[slots, None], blended, descriptors)
+        self.tracks.has_descriptor[slots] = True
+
+    def flushTrajectories(self):
+        """Pass the pending records of the current persons to the trajectory log (at the end of a run)."""
+        with self.tracks_lock:
+            self.tracks.logHistory(np.flatnonzero(self.tracks.confirmed & (self.tracks.active | self.tracks.lost)))
 
-        for idx in range(len(self.persons)):
-            if self.persons[idx].face is not None:
-                self.persons[idx].face.counter -= 1
+    def handleFaces(self, faces, similarities):
+        """Check if a detected face belongs (spatially) to a person, and track it. Discard it otherwise."""
+        persons = self.tracks.slots(confirmed=True)
+        if len(faces) > 0 and len(persons) > 0:
+            faces = np.array([face[:4] for face in faces], dtype=np.float32)
+            faces_std = np.hstack((faces[:, :2] - faces[:, 2:] / 2, faces[:, 2:]))
+            # (persons x faces) mask of the faces inside each person's box
+            boxes = self.tracks.boxes[persons]
+            inside = ((faces_std[None, :, 0] >= boxes[:, None, 0]) & (faces_std[None, :, 1] >= boxes[:, None, 1]) &
+                      (faces_std[None, :, 0] + faces_std[None, :, 2] <= boxes[:, None, 0] + boxes[:, None, 2]) &
+                      (faces_std[None, :, 1] + faces_std[None, :, 3] <= boxes[:, None, 1] + boxes[:, None, 3]))
+            with_face = inside.any(axis=1)
+            # The last face inside each box is kept
+            face_idx = inside.shape[1] - 1 - np.argmax(inside[:, ::-1], axis=1)
+            slots, face_idx = persons[with_face], face_idx[with_face]
+            self.tracks.face_boxes[slots] = faces[face_idx]
+            self.tracks.similarities[slots] = np.asarray(similarities, dtype=np.float32)[face_idx]
+            self.tracks.face_counters[slots] = FACE_PATIENCE
+            self.tracks.has_face[slots] = True
 
+        self.tracks.face_counters[persons[self.tracks.has_face[persons]]] -= 1
 
     def checkRef(self):
         """Look for the reference faces among the tracked ones."""
-        min_similarity = np.inf
-        ref_idx = None
-        for pi, person in enumerate(self.persons):
-            if person.face is not None and person.face.similarity < self.ref_sim_thr and person.face.similarity < min_similarity:
-                ref_idx = pi
-                min_similarity = person.face.similarity
+        persons = self.tracks.slots(confirmed=True)
+        similarities = np.where(self.tracks.has_face[persons], self.tracks.similarities[persons], np.inf)
+        if len(persons) == 0 or similarities.min() >= self.ref_sim_thr:
+            return
         # Update the reference person
-        if ref_idx is not None:
-            for idx in range(len(self.persons)):
-                if idx == ref_idx:
-                    self.persons[ref_idx].is_ref = True
-                else:
-                    self.persons[ref_idx].is_ref = False
+        self.tracks.is_ref[persons] = False
+        self.tracks.is_ref[persons[np.argmin(similarities)]] = True
 
     def iterate(self):
         # Fetch the images
-        self.lock.acquire()
         try:
-            self.image, self.depth = self.cam.getImages()
-            self.frame_counter += 1
+            image, depth = self.cam.getImages()
         except StopIteration:
             self.is_activated = False
-            self.lock.release()
             return
-        self.lock.release()
+        self.feed(image, depth)
+
+    def feed(self, image, depth):
+        """Step the tracking on a new frame. Return the resulting snapshot."""
+        if depth is not None:
+            # Metric float32 depth, shared by the tracker and the snapshot consumers
+            depth = np.asarray(depth, dtype=np.float32)
+        else:
+            depth = []
+        with self.lock:
+            self.image, self.depth = image, depth
+            self.frame_counter += 1
+        self.frames.publish()
 
         # Step on every person
-        self.stepAll()
-        self.setPrior()
-        # And refresh candidates and persons
+        with self.tracks_lock:
+            start = time.perf_counter()
+            self.stepAll()
+            self.tracks.record(self.frame_counter, time.monotonic())
+            self.tracks.expire(self.frame_counter)
+            self.updateDepths()
+            self.replenish()
+            self.publish()
+            if self.budget_controller is not None:
+                self.adaptSettings(1000.0 * (time.perf_counter() - start))
+        return self.snapshot
+
+    def adaptSettings(self, elapsed_ms):
+        """Feed the cost of a step to the budget controller, and apply the settings it chooses."""
+        if not self.budget_controller.update(elapsed_ms):
+            return
+        settings = self.budget_controller.settings
+        self.motion_estimator.configure(settings)
+        change = {
+            'Frame': self.frame_counter,
+            'StepCost': f'{self.budget_controller.cost:.4f} ms',
+            'Level': self.budget_controller.level,
+        }
+        change.update(settings)
+        self.settings_changes.append(change)
+        cprint.info(f'Tracker settings switched to the level {change["Level"]} ({change["StepCost"]} per step)')
 
     def run(self):
         self.lock.acquire()
         self.image, self.depth = self.cam.getImages()
         self.frame_counter += 1
         self.lock.release()
+        self.frames.publish()
         self.setPrior()
+        self.publish()
 
         if self.debug:
             # The control will be carried by the main thread
             return
-        elapsed = np.infty
+        # Run at the sensor rate, and only when the camera has a new frame (if it is live)
+        self.scheduler = RateScheduler('PeopleTracker', PERIOD, self.cam.frames)
         while self.is_activated:
-            # Control the rate
-            if self.frame_counter % 100 == 0:
-                print(f'tracker[{self.frame_counter}]:elapsed:{elapsed:.3f} s')
-            if elapsed <= PERIOD:
-                time.sleep(PERIOD - elapsed)
-            start = time.time()
-            self.iterate()
-            elapsed = time.time() - start
+            if self.scheduler.wait():
+                self.iterate()
@@ -1,6 +1,9 @@
 import numpy as np
 from cprint import cprint
 
+XLIM = 0.7  # maximum linear response
+WLIM = 1    # maximum angular response
+
 
 class PIDController:
     '''Given the desired gains for each component, create a PID controller to
@@ -0,0 +1,118 @@
+#
+# Created on Oct. 2026
+#
+# Offline replay of the tracker: the frames of a recorded session are fed
+# as fast as possible, and the detections logged during that session are
+# applied on the same frames they were applied live, so the tracking can be
+# re-run deterministically without loading any network.
+
+__author__ = '@naxvm'
+
+import pickle
+import time
+from collections import defaultdict
+
+import numpy as np
+
+import utils
+from Actuation.people_tracker import PeopleTracker, PERIOD
+from Actuation.pid_controller import PIDController, XLIM, WLIM
+
+
+def loadDetectionLog(filename):
+    """Load a detection log saved by the benchmark, grouped by the frame where each update was applied."""
+    with open(filename, 'rb') as f:
+        detection_log = pickle.load(f)
+    by_frame = defaultdict(list)
+    for applied, computed, boxes, faces, similarities in detection_log:
+        by_frame[applied].append((computed, boxes, faces, similarities))
+    return by_frame
+
+
+class TrackerReplay:
+    """Drive a PeopleTracker over (N, H, W, 3) frames and a detection log. The
+    frame counters follow the live tracker: the first frame is the prior one
+    (counter 2, as the camera is opened on the frame before). The Budget node is
+    ignored: adapting to the wall-clock cost would make the replays depend on the
+    machine and its load."""
+
+    def __init__(self, images, detection_log, ptcfg):
+        self.images = images
+        self.detection_log = detection_log
+        self.ptcfg = ptcfg
+
+    def run(self, max_frames=None):
+        """Replay the session. Return the per-frame reference (track id, -1 if not found),
+        its boxes, the processing time of each frame, and the summary metrics."""
+        ptcfg = self.ptcfg
+        tracker = PeopleTracker(ptcfg['Patience'], ptcfg['RefSimThr'], ptcfg['SamePersonThr'],
+                                association_cfg=ptcfg.get('Association'),
+                                ego_motion_cfg=ptcfg.get('EgoMotion'), motion_cfg=ptcfg.get('Motion'),
+                                debug=True)
+        n_frames = len(self.images) if max_frames is None else min(max_frames, len(self.images))
+        im_height, im_width = self.images.shape[1:3]
+        tracker.im_size = tracker.tracks.im_size = (im_width, im_height)
+
+        ref_ids = np.full(n_frames, -1, dtype=np.int64)
+        ref_boxes = np.full((n_frames, 4), np.nan, dtype=np.float32)
+        costs = np.zeros(n_frames)
+        start = time.perf_counter()
+        for idx in range(1, n_frames):
+            frame_start = time.perf_counter()
+            if idx == 1:
+                # Prior frame (the camera served the frame 0 when it was opened)
+                tracker.image, tracker.frame_counter = self.images[idx], idx + 1
+                tracker.setPrior()
+                tracker.publish()
+            else:
+                tracker.feed(self.images[idx], None)
+            for computed, boxes, faces, similarities in self.detection_log.get(tracker.frame_counter, []):
+                tracker.updateWithDetections(boxes, faces, similarities, frame=computed)
+            costs[idx] = time.perf_counter() - frame_start
+
+            for person in tracker.getSnapshot().persons:
+                if person.is_ref:
+                    ref_ids[idx] = person.track_id
+                    ref_boxes[idx] = person.coords
+        elapsed = time.perf_counter() - start
+
+        # Changes of the reference track between frames where it is found
+        found = ref_ids[ref_ids >= 0]
+        id_switches = int(np.count_nonzero(found[1:] != found[:-1]))
+        metrics = {
+            'Frames': n_frames - 1,
+            'FramesWithRef': int(len(found)),
+            'IdSwitches': id_switches,
+            'TrackedPersons': tracker.tracked_counter,
+            'MedianFrameCost': 1000.0 * float(np.median(costs[1:])) if n_frames > 1 else 0.0,
+            'RealTimeFactor': (n_frames - 1) * PERIOD / max(elapsed, 1e-9),
+        }
+        return ref_ids, ref_boxes, costs, metrics
+
+
+def replayControl(ref_boxes, depths, xcfg, wcfg, im_width):
+    """Compute the PID responses over the reference boxes of a replay, as followperson
+    does. The loop is open (the recorded robot motion is not affected), so only the
+    magnitude and smoothness of the responses can be compared."""
+    x_pid = PIDController(xcfg['Kp'], xcfg['Ki'], xcfg['Kd'], K_loss=0.75,
+                          limit=XLIM, stop_range=(xcfg['Min'], xcfg['Max']),
+                          soften=True, verbose=False)
+    w_pid = PIDController(wcfg['Kp'], wcfg['Ki'], wcfg['Kd'], K_loss=0.75,
+                          limit=WLIM, stop_range=(wcfg['Min'], wcfg['Max']),
+                          soften=True, verbose=False)
+    responses = np.zeros((len(ref_boxes), 2))
+    for idx, box in enumerate(ref_boxes):
+        if np.isnan(box[0]):
+            responses[idx] = w_pid.lostResponse(), x_pid.lostResponse()
+            continue
+        w_error = utils.computeWError(box, im_width)
+        x_error = utils.computeXError(box, depths[idx]) if depths is not None else np.nan
+        responses[idx] = w_pid.computeResponse(w_error), x_pid.computeResponse(x_error)
+
+    jerk = np.abs(np.diff(responses, axis=0)).mean(axis=0) if len(responses) > 1 else np.zeros(2)
+    return {
+        'WMeanResponse': float(np.abs(responses[:, 0]).mean()),
+        'XMeanResponse': float(np.abs(responses[:, 1]).mean()),
+        'WResponseJerk': float(jerk[0]),
+        'XResponseJerk': float(jerk[1]),
+    }
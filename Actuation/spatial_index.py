@@ -0,0 +1,73 @@
+#
+# Created on Oct. 2026
+#
+# Uniform grid over the keypoints of a frame: the points are bucketed by
+# cell (sorted, with the offsets of each cell), so the points inside a box
+# are found by only visiting the cells it covers.
+
+__author__ = '@naxvm'
+
+import numpy as np
+
+CELL_SIZE = 32  # px, side of the grid cells
+
+
+class KeypointGrid:
+    """Spatial index of (K, 2) points over an image of im_size (width, height)."""
+
+    def __init__(self, points, im_size, cell_size=CELL_SIZE):
+        self.points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        self.cell_size = cell_size
+        self.n_cols = int(np.ceil(im_size[0] / cell_size))
+        self.n_rows = int(np.ceil(im_size[1] / cell_size))
+
+        cols, rows = self.cellOf(self.points[:, 0], self.points[:, 1])
+        cells = rows * self.n_cols + cols
+        # Points sorted by cell, and the offset where each cell starts
+        self.order = np.argsort(cells, kind='stable')
+        self.starts = np.searchsorted(cells[self.order], np.arange(self.n_rows * self.n_cols + 1))
+
+    def cellOf(self, x, y):
+        """Column and row of the cells containing the coordinates (clipped to the grid)."""
+        cols = np.clip((x // self.cell_size).astype(int), 0, self.n_cols - 1)
+        rows = np.clip((y // self.cell_size).astype(int), 0, self.n_rows - 1)
+        return cols, rows
+
+    def query(self, box):
+        """Indices of the points inside a [x, y, w, h] box."""
+        _, point_idx = self.queryBoxes([box])
+        return point_idx
+
+    def queryBoxes(self, boxes):
+        """Points inside several [x, y, w, h] boxes at once. Return the (box index,
+        point index) pairs of every membership."""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        x1, y1 = boxes[:, 0], boxes[:, 1]
+        x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+        col1, row1 = self.cellOf(x1, y1)
+        col2, row2 = self.cellOf(x2, y2)
+
+        # Each box covers some grid rows, and a contiguous range of cells on each of them
+        n_box_rows = np.maximum(row2 - row1 + 1, 0)
+        box_of_row = np.repeat(np.arange(len(boxes)), n_box_rows)
+        first_row = np.cumsum(n_box_rows) - n_box_rows
+        rows = row1[box_of_row] + np.arange(len(box_of_row)) - np.repeat(first_row, n_box_rows)
+        seg_start = self.starts[rows * self.n_cols + col1[box_of_row]]
+        seg_end = self.starts[rows * self.n_cols + col2[box_of_row] + 1]
+
+        # Expand the ranges of sorted points
+        lengths = np.maximum(seg_end - seg_start, 0)
+        box_idx = np.repeat(box_of_row, lengths)
+        first_pos = np.cumsum(lengths) - lengths
+        positions = np.arange(len(box_idx)) - np.repeat(first_pos - seg_start, lengths)
+        point_idx = self.order[positions]
+
+        # Exact test on the border cells
+        x, y = self.points[point_idx, 0], self.points[point_idx, 1]
+        inside = (x >= x1[box_idx]) & (y >= y1[box_idx]) & (x <= x2[box_idx]) & (y <= y2[box_idx])
+        return box_idx[inside], point_idx[inside]
+
+    def counts(self, boxes):
+        """Number of points inside each [x, y, w, h] box."""
+        box_idx, _ = self.queryBoxes(boxes)
+        return np.bincount(box_idx, minlength=len(boxes))
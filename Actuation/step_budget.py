@@ -0,0 +1,66 @@
+#
+# Created on Oct. 2026
+#
+# Keep the cost of the tracker steps within a time budget: an integral
+# controller on the measured step cost moves along a ladder of keypoint
+# densities and LK settings (richer when there is spare time, cheaper when
+# the step is too slow), so the tracker holds the sensor rate.
+
+__author__ = '@naxvm'
+
+from collections import deque
+
+import numpy as np
+
+# Values used when they are not provided on the PeopleTracker.Budget YML node
+DEFAULT_BUDGET_CFG = {
+    'StepBudget': 20.0,  # ms, target (rolling median) cost of a tracker step (within the 33 ms period)
+    'Window': 15,        # steps measured before each decision
+    'Gain': 1.0,         # levels moved per relative error of the step cost
+}
+
+# Settings from the richest to the cheapest one
+LEVELS = [
+    {'KpsPerTrack': 60, 'BackgroundKps': 80, 'MinDistance': 5, 'WinSize': 31, 'MaxLevel': 3},
+    {'KpsPerTrack': 40, 'BackgroundKps': 60, 'MinDistance': 7, 'WinSize': 25, 'MaxLevel': 2},
+    {'KpsPerTrack': 30, 'BackgroundKps': 40, 'MinDistance': 7, 'WinSize': 21, 'MaxLevel': 2},
+    {'KpsPerTrack': 20, 'BackgroundKps': 30, 'MinDistance': 9, 'WinSize': 15, 'MaxLevel': 1},
+    {'KpsPerTrack': 12, 'BackgroundKps': 20, 'MinDistance': 11, 'WinSize': 11, 'MaxLevel': 1},
+]
+DEFAULT_LEVEL = 1  # the former constant settings
+
+
+class BudgetController:
+    """Integral controller of the settings level on the rolling median step cost."""
+
+    def __init__(self, budget_cfg):
+        cfg = dict(DEFAULT_BUDGET_CFG)
+        cfg.update(budget_cfg)
+        self.budget = cfg['StepBudget']
+        self.gain = cfg['Gain']
+        self.costs = deque(maxlen=cfg['Window'])
+        self.cost = 0.0  # median cost of the latest window
+        # Continuous (integrated) level, and the one applied
+        self.target = float(DEFAULT_LEVEL)
+        self.level = DEFAULT_LEVEL
+
+    @property
+    def settings(self):
+        return LEVELS[self.level]
+
+    def update(self, elapsed_ms):
+        """Store the cost of a new step. Return True if the settings level changed."""
+        self.costs.append(elapsed_ms)
+        if len(self.costs) < self.costs.maxlen:
+            return False
+        # Too slow: towards the cheaper levels. Spare time: towards the richer ones
+        self.cost = float(np.median(self.costs))
+        error = self.cost / self.budget - 1
+        self.target = float(np.clip(self.target + self.gain * error, 0, len(LEVELS) - 1))
+        # The next decision is taken on steps with the new settings
+        self.costs.clear()
+        level = int(round(self.target))
+        if level == self.level:
+            return False
+        self.level = level
+        return True
@@ -0,0 +1,230 @@
+#
+# Created on Oct. 2026
+#
+# Struct-of-arrays storage of the tracked persons (and candidates): one
+# preallocated array per attribute, indexed by slot, so every tracker
+# operation works on all the tracks at once and nothing is allocated
+# between frames. Freed slots are reused.
+
+__author__ = '@naxvm'
+
+import numpy as np
+
+from Actuation import motion_model
+from Actuation.appearance import DESCRIPTOR_SIZE
+from Actuation.tracking_classes import FaceView, PersonView
+
+INITIAL_CAPACITY = 32  # slots preallocated (the table doubles its size when full)
+FACE_PATIENCE = 5      # steps a face is kept without being detected again
+HISTORY_LEN = 60       # steps kept on the history ring buffer of each track
+LOST_WINDOW = 15       # frames a lost person can be re-associated before freeing its slot
+VELOCITY_SPAN = 5      # history steps used to estimate the velocity of a track
+
+
+class TrackTable:
+    """Contiguous arrays with the state of every track. A slot is either free,
+    a candidate (not confirmed yet), a confirmed (tracked) person, or a recently
+    lost person (which can still be re-associated). Each track has a unique id
+    and a ring buffer with its latest boxes, timestamps and face similarities.
+    If a history_log callable is given, it receives the records of the confirmed
+    tracks as (id, frames, stamps, boxes, similarities) chunks, before they are
+    overwritten (e.g. to log their whole trajectories)."""
+
+    def __init__(self, capacity=INITIAL_CAPACITY, im_size=(640, 480), history_log=None):
+        self.im_size = im_size
+        self.capacity = 0
+        self.next_id = 0
+        self.free = []
+        self.history_log = history_log
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        """Reallocate the arrays with a larger capacity, keeping the current tracks."""
+        old = self.capacity
+        fields = {
+            'active': ((), bool),
+            'confirmed': ((), bool),
+            'ids': ((), np.int64),
+            'boxes': ((4,), np.float32),        # [x, y, w, h]
+            'depths': ((), np.float32),         # robust distance (m) of the track, nan if unknown
+            'counters': ((), np.int32),
+            'has_face': ((), bool),
+            'face_boxes': ((4,), np.float32),   # [cx, cy, w, h]
+            'face_counters': ((), np.int32),
+            'similarities': ((), np.float32),
+            'is_ref': ((), bool),
+            'states': ((4,), np.float64),       # Kalman filter (see motion_model)
+            'covs': ((4, 4), np.float64),
+            'lost': ((), bool),
+            'lost_frame': ((), np.int64),
+            'has_descriptor': ((), bool),
+            'descriptors': ((DESCRIPTOR_SIZE,), np.float32),  # appearance (see appearance)
+            # History ring buffers (position of the next record: hist_count % HISTORY_LEN)
+            'hist_count': ((), np.int64),
+            'hist_logged': ((), np.int64),  # records already passed to the history log
+            'hist_frames': ((HISTORY_LEN,), np.int64),
+            'hist_stamps': ((HISTORY_LEN,), np.float64),
+            'hist_boxes': ((HISTORY_LEN, 4), np.float32),
+            'hist_sims': ((HISTORY_LEN,), np.float32),  # nan without face
+        }
+        for name, (shape, dtype) in fields.items():
+            array = np.zeros((capacity,) + shape, dtype=dtype)
+            if old > 0:
+                array[:old] = getattr(self, name)
+            setattr(self, name, array)
+        # Lowest slots are reused first
+        self.free = list(range(capacity - 1, old - 1, -1)) + self.free
+        self.capacity = capacity
+
+    def add(self, box, track_id=None):
+        """Start a new candidate on a [x, y, w, h, ...] box (resuming the id of
+        a former track, if given). Return its slot."""
+        if not self.free:
+            self.grow(2 * self.capacity)
+        slot = self.free.pop()
+        self.active[slot] = True
+        self.confirmed[slot] = False
+        if track_id is None:
+            track_id = self.next_id
+            self.next_id += 1
+        self.ids[slot] = track_id
+        self.boxes[slot] = box[:4]
+        self.depths[slot] = np.nan
+        self.counters[slot] = 0
+        self.has_face[slot] = False
+        self.is_ref[slot] = False
+        self.lost[slot] = False
+        self.has_descriptor[slot] = False
+        self.hist_count[slot] = self.hist_logged[slot] = 0
+        self.states[slot], self.covs[slot] = motion_model.initState(box)
+        return slot
+
+    def remove(self, slots):
+        """Free the slots of the given tracks (the candidates are not logged)."""
+        slots = np.asarray(slots, dtype=int)
+        self.logHistory(slots[self.confirmed[slots]])
+        self.active[slots] = False
+        self.lost[slots] = False
+        self.has_face[slots] = False
+        self.is_ref[slots] = False
+        self.free.extend(int(slot) for slot in np.sort(slots)[::-1])
+
+    def lose(self, slots, frame):
+        """Deactivate the given tracks, keeping them for a later re-association."""
+        self.active[slots] = False
+        self.lost[slots] = True
+        self.lost_frame[slots] = frame
+        self.is_ref[slots] = False
+
+    def expire(self, frame):
+        """Free the tracks lost for longer than the re-association window."""
+        expired = np.flatnonzero(self.lost & (frame - self.lost_frame > LOST_WINDOW))
+        if len(expired) > 0:
+            self.remove(expired)
+
+    def revive(self, slot, box):
+        """Resume a lost track on a new box, keeping its id and its estimated velocity."""
+        velocity = self.velocities([slot])[0]
+        self.active[slot] = True
+        self.lost[slot] = False
+        self.has_face[slot] = False
+        self.boxes[slot] = box[:4]
+        self.states[slot], self.covs[slot] = motion_model.initState(box)
+        self.states[slot, 2:] = velocity
+
+    def lostPredictions(self, frame):
+        """Slots of the lost tracks and their boxes extrapolated (with their
+        velocity) to the given frame."""
+        slots = np.flatnonzero(self.lost)
+        boxes = self.boxes[slots].copy()
+        boxes[:, :2] += self.velocities(slots) * (frame - self.lost_frame[slots])[:, None]
+        return slots, boxes
+
+    def record(self, frame, stamp):
+        """Store the current boxes (and face similarities) of the active tracks on their histories."""
+        slots = self.slots()
+        pos = self.hist_count[slots] % HISTORY_LEN
+        self.hist_frames[slots, pos] = frame
+        self.hist_stamps[slots, pos] = stamp
+        self.hist_boxes[slots, pos] = self.boxes[slots]
+        self.hist_sims[slots, pos] = np.where(self.has_face[slots], self.similarities[slots], np.nan)
+        self.hist_count[slots] += 1
+        # Log the confirmed tracks before their buffers wrap
+        full = slots[self.confirmed[slots] & (self.hist_count[slots] - self.hist_logged[slots] >= HISTORY_LEN)]
+        self.logHistory(full)
+
+    def logHistory(self, slots):
+        """Pass the records of the given tracks which were not logged yet to the history log."""
+        if self.history_log is None:
+            return
+        for slot in slots:
+            records = self.history(slot, since=self.hist_logged[slot])
+            if len(records[1]) > 0:
+                self.history_log(*records)
+            self.hist_logged[slot] = self.hist_count[slot]
+
+    def history(self, slot, since=0):
+        """Chronological history of a track: (id, frames, stamps, boxes, similarities),
+        from the given record number (as long as it is still on the ring buffer)."""
+        count = self.hist_count[slot]
+        n_records = min(count - since, HISTORY_LEN)
+        order = (count - n_records + np.arange(n_records)) % HISTORY_LEN
+        return (int(self.ids[slot]), self.hist_frames[slot, order].copy(), self.hist_stamps[slot, order].copy(),
+                self.hist_boxes[slot, order].copy(), self.hist_sims[slot, order].copy())
+
+    def velocities(self, slots, span=VELOCITY_SPAN):
+        """(N, 2) velocities (px/frame) of the box centers over the latest records
+        of their histories (zero if there are less than two of them)."""
+        slots = np.asarray(slots, dtype=int)
+        count = self.hist_count[slots]
+        n_records = np.minimum(np.minimum(count, HISTORY_LEN), span + 1)
+        last = (count - 1) % HISTORY_LEN
+        first = (count - n_records) % HISTORY_LEN
+        boxes_last = self.hist_boxes[slots, last]
+        boxes_first = self.hist_boxes[slots, first]
+        centers_diff = (boxes_last[:, :2] + boxes_last[:, 2:] / 2) - (boxes_first[:, :2] + boxes_first[:, 2:] / 2)
+        elapsed = self.hist_frames[slots, last] - self.hist_frames[slots, first]
+        velocities = centers_diff / np.maximum(elapsed, 1)[:, None]
+        velocities[n_records < 2] = 0
+        return velocities
+
+    def slots(self, confirmed=None):
+        """Slots of the active tracks (only the confirmed or candidate ones if specified)."""
+        mask = self.active if confirmed is None else self.active & (self.confirmed == confirmed)
+        return np.flatnonzero(mask)
+
+    def setStates(self, slots, states, covs, std_ratios=None, boxes=None):
+        """Adopt new filtered states, centering the boxes on them. The box sizes come from
+        the new boxes if given (detections), or are rescaled by the non-nan std_ratios."""
+        displ = states[:, :2] - self.states[slots, :2]
+        self.states[slots] = states
+        self.covs[slots] = covs
+        new_boxes = self.boxes[slots] if boxes is None else np.asarray(boxes, dtype=np.float32)[:, :4]
+        if std_ratios is not None:
+            new_boxes[:, 2:] *= np.where(np.isnan(std_ratios), 1, std_ratios)
+        new_boxes[:, 0] = np.clip(states[:, 0] - new_boxes[:, 2] / 2, 0, self.im_size[0])
+        new_boxes[:, 1] = np.clip(states[:, 1] - new_boxes[:, 3] / 2, 0, self.im_size[1])
+        self.boxes[slots] = new_boxes
+        self.moveFaces(slots, displ)
+
+    def moveFaces(self, slots, displ):
+        """Move the faces along with their persons, and remove those which do not belong to them anymore."""
+        faces = self.face_boxes[slots]
+        faces[:, 0] = np.clip(faces[:, 0] + displ[:, 0], 0, self.im_size[0])
+        faces[:, 1] = np.clip(faces[:, 1] + displ[:, 1], 0, self.im_size[1])
+        self.face_boxes[slots] = faces
+
+        boxes = self.boxes[slots]
+        inside = ((faces[:, 0] >= boxes[:, 0]) & (faces[:, 1] >= boxes[:, 1]) &
+                  (faces[:, 0] + faces[:, 2] <= boxes[:, 0] + boxes[:, 2]) &
+                  (faces[:, 1] + faces[:, 3] <= boxes[:, 1] + boxes[:, 3]))
+        self.has_face[slots] &= inside & (self.face_counters[slots] > 0)
+
+    def view(self, slot):
+        """Immutable copy of the current state of a track."""
+        face = None
+        if self.has_face[slot]:
+            face = FaceView(tuple(self.face_boxes[slot].tolist()), float(self.similarities[slot]),
+                            int(self.face_counters[slot]))
+        return PersonView(tuple(self.boxes[slot].tolist()), int(self.counters[slot]), face,
+                          bool(self.is_ref[slot]), int(self.ids[slot]), float(self.depths[slot]))
@@ -1,77 +1,63 @@
-import numpy as np
-from utils import bb1inbb2
-
-
-class Face:
-    """Instance of a tracked face."""
-    def __init__(self, coords, similarity, counter=5):
-        self.coords = list(coords)[:4]
-        self.similarity = similarity
-        self.counter = counter
-
-
-class Person:
-    """Instance of a tracked person."""
-    def __init__(self, coords, counter=0, face=None, is_ref=False, im_size=(640, 480)):
-        self.coords = coords
-        self.counter = counter
-
-        self.face = face
-        self.is_ref = is_ref
-
-        self.prev_crop = None
-        self.keypoints = None
-        self.im_size = im_size
-
-    def step(self, old_kps, new_kps):
-        """Perform a forward step, computing the displacement
-        using the descriptors found inside the location of the person."""
-
-        # Look for suitable descriptors, "bounding box" (descriptor point) inside the coords?
-        valid_idxs = list(map(lambda kp: bb1inbb2([kp[0], kp[1], 0, 0], self.coords), old_kps.reshape(-1, 2)))
-        if sum(valid_idxs) == 0:
-            return
-
-        old_valid = old_kps[valid_idxs]
-        new_valid = new_kps[valid_idxs]
-        # And compute the average displacement
-        displacement = new_valid - old_valid
-        avg_displ = displacement.mean(axis=0).squeeze()
-
-        # Move the bounding box accordingly (keeping it inside the image)
-        self.coords[0] = np.clip(self.coords[0] + avg_displ[0], 0, self.im_size[0])
-        self.coords[1] = np.clip(self.coords[1] + avg_displ[1], 0, self.im_size[1])
-        if self.face is not None:
-            self.face.coords[0] = np.clip(self.face.coords[0] + avg_displ[0], 0, self.im_size[0])
-            self.face.coords[1] = np.clip(self.face.coords[1] + avg_displ[1], 0, self.im_size[1])
-
-        # And rescale it accordingly to the distribution of the keypoints
-        old_std = old_valid.std(axis=0)
-        new_std = new_valid.std(axis=0)
-        if np.count_nonzero(old_std) == 2 and np.count_nonzero(new_std) == 2:
-            std_ratio = new_std / old_std
-            self.coords[2] = self.coords[2] * std_ratio[0]
-            self.coords[3] = self.coords[3] * std_ratio[1]
-
-
-        # self.counter += 2
-
-        # Remove the face if it does not belong to the person anymore
-        face = self.face
-        if face is not None:
-            # self.face.counter -= 1
-            if not bb1inbb2(face.coords, self.coords):
-                self.face = None
-            if face.counter <= 0:
-                self.face = None
-
-    def setFace(self, coords, similarity):
-        face = Face(coords, similarity)
-        self.face = face
+from collections import namedtuple
 
+import numpy as np
 
-    def __repr__(self):
-        thestr = f'{self.coords[:4]} [{self.counter}, {self.is_ref}]'
-        if self.face is not None:
-            thestr += f' -- Face: {self.face.coords} ({self.face.counter}, {self.face.similarity})'
-        return thestr + '\n'
+# Immutable views of the tracked objects, published by the tracker on each update
+FaceView = namedtuple('FaceView', ['coords', 'similarity', 'counter'])
+PersonView = namedtuple('PersonView', ['coords', 'counter', 'face', 'is_ref', 'track_id', 'depth'])
+TrackerSnapshot = namedtuple('TrackerSnapshot', ['version', 'frame', 'persons', 'keypoints', 'image', 'depth',
+                                                 'ego_motion'])
+
+
+def keypointsInBoxes(boxes, kps):
+    """Membership mask (boxes x keypoints) of the keypoints inside each
+    [x, y, w, h] box, computed at once by broadcasting."""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    x, y = kps[None, :, 0], kps[None, :, 1]
+    x1, y1 = boxes[:, 0:1], boxes[:, 1:2]
+    x2, y2 = x1 + boxes[:, 2:3], y1 + boxes[:, 3:4]
+    return (x >= x1) & (y >= y1) & (x <= x2) & (y <= y2)
+
+
+def tracksMotion(boxes, old_kps, new_kps, members=None):
+    """Average displacement and spread ratio of the keypoints inside each box,
+    using segment sums over the (box index, keypoint index) memberships (from a
+    KeypointGrid, or computed here by brute force). Return the (N, 2)
+    displacements, the (N, 2) ratios (nan if the spread can't be compared)
+    and whether each box contained any keypoint."""
+    old_kps = old_kps.reshape(-1, 2).astype(np.float64)
+    new_kps = new_kps.reshape(-1, 2).astype(np.float64)
+    n_boxes = len(boxes)
+    if members is None:
+        members = np.nonzero(keypointsInBoxes(boxes, old_kps))
+    box_idx, kp_idx = members
+    counts = np.bincount(box_idx, minlength=n_boxes)
+    valid = counts > 0
+    norm = 1.0 / np.maximum(counts, 1)[:, None]
+
+    def segmentSums(values):
+        return np.stack([np.bincount(box_idx, values[:, dim], minlength=n_boxes) for dim in range(2)], axis=1)
+
+    # Segment sums of the coordinates (and their squares) of the keypoints in each box
+    old_pts, new_pts = old_kps[kp_idx], new_kps[kp_idx]
+    old_mean = segmentSums(old_pts) * norm
+    new_mean = segmentSums(new_pts) * norm
+    old_std = np.sqrt(np.maximum(segmentSums(old_pts**2) * norm - old_mean**2, 0))
+    new_std = np.sqrt(np.maximum(segmentSums(new_pts**2) * norm - new_mean**2, 0))
+
+    avg_displ = new_mean - old_mean
+    comparable = (old_std > 1e-6).all(axis=1) & (new_std > 1e-6).all(axis=1)
+    std_ratio = np.full_like(avg_displ, np.nan)
+    std_ratio[comparable] = new_std[comparable] / old_std[comparable]
+
+    return avg_displ, std_ratio, valid
+
+
+def moveBox(coords, avg_displ, std_ratio, im_size):
+    """Move (in place) a box by a displacement, keeping it inside the image,
+    and rescale it if the spread of its keypoints changed."""
+    coords[0] = np.clip(coords[0] + avg_displ[0], 0, im_size[0])
+    coords[1] = np.clip(coords[1] + avg_displ[1], 0, im_size[1])
+    if std_ratio is not None:
+        coords[2] = coords[2] * std_ratio[0]
+        coords[3] = coords[3] * std_ratio[1]
@@ -14,6 +14,7 @@ import cv_bridge
 import cv2
 import time
 import rosbag
+from scheduler import SequenceNotifier
 
 IMAGE_HEIGHT = 480
 IMAGE_WIDTH = 640
@@ -29,6 +30,8 @@ class ROSCam:
         by rospy threads).
         """
         self.use_bag = rosbag_path is not None
+        # New frames notifier (a bag always serves a new frame when asked)
+        self.frames = None if self.use_bag else SequenceNotifier()
         if self.use_bag:
             # Create iterators for the rosbag
             self.bag = rosbag.Bag(rosbag_path)
@@ -74,6 +77,7 @@ class ROSCam:
         self.__rgb_data = rgb_data
         rospy.logdebug("RGB updated")
         self.lock.release()
+        self.frames.publish()
 
     def __depthCallback(self, depth_data):
         self.lock.acquire()
@@ -0,0 +1,71 @@
+#
+# Created on Oct. 2026
+#
+# Watch the rolling inference latency of the person detector, and decide
+# when to switch to a lighter model (and back), with hysteresis.
+
+__author__ = '@naxvm'
+
+from collections import deque
+
+import numpy as np
+
+# Values used when they are not provided on the Networks.Fallback YML node
+DEFAULT_FALLBACK_CFG = {
+    'LatencyBudget': 100.0,  # ms, rolling median detection time which triggers the downgrade
+    'RecoverRatio': 0.7,     # the primary model is restored when its estimated latency is below this budget ratio
+    'Window': 15,            # inferences of the rolling window
+    'MinDwell': 60,          # minimum inferences between switches
+}
+
+
+class LoadMonitor:
+    """Rolling median of the inference latency with a two-threshold
+    (downgrade / recover) policy and a minimum dwell time."""
+
+    def __init__(self, fallback_cfg):
+        cfg = dict(DEFAULT_FALLBACK_CFG)
+        cfg.update(fallback_cfg)
+        self.budget = cfg['LatencyBudget']
+        self.recover_ratio = cfg['RecoverRatio']
+        self.min_dwell = cfg['MinDwell']
+        self.latencies = deque(maxlen=cfg['Window'])
+
+        self.degraded = False
+        self.since_switch = 0
+        # Latency ratio primary / fallback, measured around the last downgrade
+        self.speedup = None
+        self.primary_latency = None
+
+    def update(self, elapsed_ms):
+        """Store a new latency measurement. Return True if the model has to be switched."""
+        self.latencies.append(elapsed_ms)
+        self.since_switch += 1
+        if len(self.latencies) < self.latencies.maxlen or self.since_switch < self.min_dwell:
+            return False
+
+        latency = np.median(self.latencies)
+        if not self.degraded:
+            if latency > self.budget:
+                self.primary_latency = latency
+                return True
+        else:
+            if self.speedup is None:
+                # First full window on the fallback model
+                self.speedup = self.primary_latency / max(latency, 1e-3)
+            # What the primary model would take now
+            if latency * self.speedup < self.recover_ratio * self.budget:
+                return True
+        return False
+
+    def switched(self):
+        """Register a switch of model."""
+        self.degraded = not self.degraded
+        self.latencies.clear()
+        self.since_switch = 0
+        if self.degraded:
+            self.speedup = None
+
+    @property
+    def latency(self):
+        return np.median(self.latencies) if self.latencies else 0.0
@@ -145,6 +145,10 @@ class DetectionNetwork:
         self.sess = tf.compat.v1.Session(graph=graph, config=conf)
         cprint.ok('Loaded the graph definition!')
 
+    def close(self):
+        """ Release the session. """
+        self.sess.close()
+
     def _forward_pass(self, feed_dict):
         """ Perform a forward pass of the provided feed_dict through the network. """
         start = datetime.now()
@@ -152,12 +156,17 @@ class DetectionNetwork:
         elapsed = datetime.now() - start
         return out, elapsed
 
-    def predict(self, img):
-        # Reshape the latest image
-        orig_h, orig_w = img.shape[:2]
+    def preprocess(self, img):
+        """ Resize an image to the network input size. """
         # img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
         input_image = Image.fromarray(img)
-        img_rsz = np.array(input_image.resize(self.input_shape[:2]))
+        return np.array(input_image.resize(self.input_shape[:2]))
+
+    def predict(self, img, img_rsz=None):
+        # Reshape the latest image (unless it was already preprocessed)
+        orig_h, orig_w = img.shape[:2]
+        if img_rsz is None:
+            img_rsz = self.preprocess(img)
 
         if self.arch == 'ssd':
             (boxes, scores, predictions, _), elapsed = self._forward_pass({self.image_tensor: img_rsz[None, ...]})
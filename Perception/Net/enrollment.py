@@ -0,0 +1,116 @@
+#
+# Created on Oct. 2026
+#
+# Offline enrollment of the reference face: the FaceNet embedding of the
+# reference person is computed once and stored, together with the signatures
+# of the inputs which produced it, so the startup can skip the face pipeline.
+
+__author__ = '@naxvm'
+
+import argparse
+import hashlib
+import os
+from datetime import datetime
+from os import path
+
+import numpy as np
+from cprint import cprint
+
+CHUNK_SIZE = 1 << 20  # bytes read at once when computing checksums
+ENROLLMENT_EXT = '.npz'
+
+
+def fileChecksum(filename):
+    """Compute the SHA-1 checksum of a file, reading it by chunks."""
+    sha = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def modelSignature(model_path):
+    """Identify a (large) model file by its path, size and modification time, without reading it."""
+    stat = os.stat(model_path)
+    return f'{path.abspath(model_path)}:{stat.st_size}:{stat.st_mtime_ns}'
+
+
+def enrollmentPath(ref_img_path):
+    """Default location of the enrollment file: besides the reference image."""
+    return path.splitext(ref_img_path)[0] + ENROLLMENT_EXT
+
+
+def saveEnrollment(filename, embedding, ref_img_path, model_path):
+    """Dump the reference embedding and its metadata into a compact file."""
+    # Written through a handle, so numpy does not append its extension to custom paths
+    with open(filename, 'wb') as f:
+        np.savez(f,
+                 embedding=np.asarray(embedding, dtype=np.float32),
+                 img_checksum=fileChecksum(ref_img_path),
+                 model_signature=modelSignature(model_path),
+                 img_path=ref_img_path,
+                 model_path=model_path,
+                 created=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    cprint.ok(f'Reference enrollment saved on {filename}')
+
+
+def loadEnrollment(filename, ref_img_path, model_path):
+    """Return the stored reference embedding, or None if the file does not exist
+    or it is stale (the image or the model changed since the enrollment)."""
+    if not path.isfile(filename):
+        return None
+
+    with np.load(filename) as data:
+        if str(data['img_checksum']) != fileChecksum(ref_img_path):
+            cprint.warn(f'Enrollment {filename} is stale: the reference image changed.')
+            return None
+        if 'model_signature' not in data.files or str(data['model_signature']) != modelSignature(model_path):
+            cprint.warn(f'Enrollment {filename} is stale: the face encoder model changed.')
+            return None
+        embedding = data['embedding']
+
+    return embedding
+
+
+def computeReferenceEmbedding(fdet_network, fenc_network, ref_img_path):
+    """Run the full face pipeline (detection, cropping and encoding) on the reference image."""
+    # Imported here, as it is only required when the enrollment has to be computed
+    from imageio import imread
+    from utils import crop_face
+
+    ref_img = imread(ref_img_path)
+    ref_box = fdet_network.predict(ref_img)
+    ref_face = crop_face(ref_img, ref_box)
+    fenc_network.setReferenceFace(ref_face)
+
+    return fenc_network.ref_embedding
+
+
+if __name__ == '__main__':
+    description = ''' Enroll the reference person offline: compute the FaceNet embedding of the reference
+    image and store it, so followperson can load it at startup instead of running the face pipeline. '''
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('ref_img', type=str, help='Image containing the reference face')
+    parser.add_argument('face_encoder_model', type=str, help='.pb file containing the FaceNet frozen graph')
+    parser.add_argument('--save_in', type=str, default=None,
+                        help='Enrollment file to write (next to the image by default)')
+    args = parser.parse_args()
+
+    for filename in [args.ref_img, args.face_encoder_model]:
+        if not path.isfile(filename):
+            cprint.fatal(f'Error: the file {filename} does not exist', interrupt=True)
+
+    save_in = args.save_in or enrollmentPath(args.ref_img)
+
+    # Imported here, in order to check the arguments before loading TensorFlow
+    from faced import FaceDetector
+    from Perception.Net.facenet import FaceNet
+
+    fdet_network = FaceDetector()
+    fenc_network = FaceNet(args.face_encoder_model)
+    embedding = computeReferenceEmbedding(fdet_network, fenc_network, args.ref_img)
+    saveEnrollment(save_in, embedding, args.ref_img, args.face_encoder_model)
+
+    fdet_network.sess.close()
+    fenc_network.sess.close()
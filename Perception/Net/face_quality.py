@@ -0,0 +1,77 @@
+#
+# Created on Oct. 2026
+#
+# Cheap quality scoring of the detected faces, used to avoid sending
+# useless crops (tiny, blurred, profile...) to the face encoder.
+
+__author__ = '@naxvm'
+
+import cv2
+import numpy as np
+
+# Thresholds used when they are not provided on the YML file
+DEFAULT_QUALITY_CFG = {
+    'MinSize': 20,           # px, shortest side of the face box
+    'MinAspectRatio': 0.8,   # height / width of the face box
+    'MaxAspectRatio': 1.8,
+    'MaxRelativeHeight': 0.4,  # vertical position of the face center inside the person box (0: top, 1: bottom)
+    'MinSharpness': 20.0,    # variance of the Laplacian of the crop
+}
+SHARPNESS_SIZE = 64  # the Laplacian is computed on crops rescaled to this size
+
+
+class FaceQualityGate:
+    """Filter the detected faces before encoding them, discarding those
+    whose geometry, position or sharpness make them useless."""
+
+    def __init__(self, quality_cfg):
+        cfg = dict(DEFAULT_QUALITY_CFG)
+        cfg.update(quality_cfg or {})
+        self.min_size = cfg['MinSize']
+        self.min_ar = cfg['MinAspectRatio']
+        self.max_ar = cfg['MaxAspectRatio']
+        self.max_rel_height = cfg['MaxRelativeHeight']
+        self.min_sharpness = cfg['MinSharpness']
+
+    def geometryMask(self, faces, persons):
+        """Vectorized check of the size, aspect ratio and position of the faces
+        ([cx, cy, w, h, p] rows) regarding the person boxes ([x, y, w, h, p] rows)."""
+        cx, cy, w, h = faces[:, 0], faces[:, 1], faces[:, 2], faces[:, 3]
+        aspect = h / np.maximum(w, 1)
+        valid = (np.minimum(w, h) >= self.min_size) & (aspect >= self.min_ar) & (aspect <= self.max_ar)
+
+        if len(persons) == 0:
+            # The tracker would discard these faces anyway
+            return np.zeros_like(valid)
+
+        # The face center has to lie on the upper part of any person box (faces x persons)
+        px, py, pw, ph = [persons[:, i][None, :] for i in range(4)]
+        rel_x = (cx[:, None] - px) / np.maximum(pw, 1)
+        rel_y = (cy[:, None] - py) / np.maximum(ph, 1)
+        in_head = (rel_x >= 0) & (rel_x <= 1) & (rel_y >= 0) & (rel_y <= self.max_rel_height)
+
+        return valid & in_head.any(axis=1)
+
+    def sharpness(self, image, face):
+        """Variance of the Laplacian of the (rescaled) grayscale face crop."""
+        cx, cy, w, h = np.asarray(face[:4]).astype(int)
+        im_h, im_w = image.shape[:2]
+        crop = image[max(0, cy - h//2):min(im_h, cy + h//2), max(0, cx - w//2):min(im_w, cx + w//2)]
+        if crop.size == 0:
+            return 0.0
+        gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY)
+        gray = cv2.resize(gray, dsize=(SHARPNESS_SIZE, SHARPNESS_SIZE), interpolation=cv2.INTER_AREA)
+        return cv2.Laplacian(gray, cv2.CV_32F).var()
+
+    def filter(self, image, faces, persons):
+        """Return the faces which are worth encoding."""
+        if len(faces) == 0:
+            return []
+
+        faces_arr = np.array([np.squeeze(f)[:5] for f in faces], dtype=np.float32)
+        persons_arr = np.array([p[:4] for p in persons], dtype=np.float32).reshape(-1, 4)
+
+        valid = self.geometryMask(faces_arr, persons_arr)
+        # The (more expensive) sharpness is only computed on the geometrically valid faces
+        return [face for face, ok in zip(faces, valid)
+                if ok and self.sharpness(image, face) >= self.min_sharpness]
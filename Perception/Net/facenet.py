@@ -1,9 +1,13 @@
+import threading
 import numpy as np
 import tensorflow as tf
 import cv2
+from concurrent.futures import ThreadPoolExecutor
 from cprint import cprint
 
 SQUARE_SIZE = 160
+POOL_MIN_FACES = 4  # below this number of faces, resizing them in the pool does not pay off
+POOL_WORKERS = 4
 
 class FaceNet:
     '''
@@ -31,18 +35,30 @@ class FaceNet:
         self.phase_train = self.sess.graph.get_tensor_by_name('phase_train:0')
         self.embeddings  = self.sess.graph.get_tensor_by_name('embeddings:0')
 
+        self.ref_embedding = None
+
+        # Preallocated batch for the preprocessed faces (grown on demand), one per calling
+        # thread: several encoders (e.g. pipeline workers) can be preprocessing at once
+        self.local = threading.local()
+        self.pool = ThreadPoolExecutor(max_workers=POOL_WORKERS)
+
         cprint.info("FaceNet ready!")
 
 
     def setReferenceFace(self, ref_crop):
         ''' Set the reference face (previously cropped by the detector). '''
 
-        # Set the reference face
-        self.ref_face = self.preprocess(ref_crop)
+        # Compute the reference embedding once (this also warms up the session)
+        ref_face = self.preprocess(ref_crop)
+        self.ref_embedding = self.embed(ref_face[None, ...])[0]
+
+    def setReferenceEmbedding(self, ref_embedding):
+        ''' Set a precomputed reference embedding (loaded from an enrollment file). '''
+        self.ref_embedding = np.asarray(ref_embedding, dtype=np.float32).ravel()
 
         # Dummy initialization...
-        dummy_tensor = np.random.randn(SQUARE_SIZE, SQUARE_SIZE, 3)
-        _ = self.distancesToRef([dummy_tensor], preprocess=False)
+        dummy_tensor = np.random.randn(1, SQUARE_SIZE, SQUARE_SIZE, 3)
+        _ = self.embed(dummy_tensor)
 
     def preprocess(self, face):
         ''' Function to preprocess a face. '''
@@ -56,25 +72,77 @@ class FaceNet:
         return prep_face
 
 
+    def _batch(self, nfaces):
+        ''' Batch of the calling thread, with room for (at least) nfaces. '''
+        batch = getattr(self.local, 'batch', None)
+        if batch is None or nfaces > len(batch):
+            batch = np.zeros((max(nfaces, POOL_MIN_FACES), SQUARE_SIZE, SQUARE_SIZE, 3), dtype=np.float32)
+            self.local.batch = batch
+        return batch
+
+    def _cropResize(self, image, det, out):
+        ''' Crop a face ([cx, cy, w, h, p]) and write it, normalized, into a slot of a batch. '''
+        cx, cy, w, h = np.squeeze(det)[:4].astype(int)
+        im_h, im_w = image.shape[:2]
+        crop = image[max(0, cy - h//2):min(im_h, cy + h//2), max(0, cx - w//2):min(im_w, cx + w//2)]
+        if crop.size == 0:
+            out[...] = 0
+            return
+        # cv2 casts the uint8 resized crop into the float32 slot, then normalize in place
+        out[...] = cv2.resize(crop, dsize=(SQUARE_SIZE, SQUARE_SIZE), interpolation=cv2.INTER_CUBIC)
+        out -= 127.5
+        out *= 0.0078125
+
+    def preprocessBatch(self, image, dets):
+        '''
+        Crop, resize and normalize all the detected faces of an image
+        into a single float32 tensor (using the thread pool if they are many).
+        The tensor is reused by the next call from the same thread.
+        '''
+        nfaces = len(dets)
+        batch = self._batch(nfaces)
+
+        if nfaces >= POOL_MIN_FACES:
+            # cv2 releases the GIL while resizing
+            list(self.pool.map(lambda i: self._cropResize(image, dets[i], batch[i]), range(nfaces)))
+        else:
+            for idx in range(nfaces):
+                self._cropResize(image, dets[idx], batch[idx])
+
+        return batch[:nfaces]
+
+    def embed(self, prep_faces):
+        ''' Compute the embeddings of a tensor of preprocessed faces. '''
+        feed_dict = {self.input:       prep_faces,
+                     self.phase_train: False}
+
+        return self.sess.run(self.embeddings, feed_dict=feed_dict)
+
     def distancesToRef(self, faces, preprocess=True):
         '''
         Compute the embeddings of a list of faces
         and check the distance to the reference one.
         '''
         nfaces = len(faces)
+        if nfaces == 0:
+            return np.zeros(0)
 
         # Tensor containing all the faces to eval
-        all_faces = np.zeros((nfaces+1, SQUARE_SIZE, SQUARE_SIZE, 3))
-        all_faces[0, ...] = self.ref_face
-        for ix in range(nfaces):
-            all_faces[ix+1, ...] = self.preprocess(faces[ix])
+        if preprocess:
+            all_faces = np.zeros((nfaces, SQUARE_SIZE, SQUARE_SIZE, 3))
+            for ix in range(nfaces):
+                all_faces[ix, ...] = self.preprocess(faces[ix])
+        else:
+            all_faces = np.asarray(faces)
 
         # Embeddings computation
-        feed_dict = {self.input:       all_faces,
-                     self.phase_train: False}
-
-        emb = self.sess.run(self.embeddings, feed_dict=feed_dict)
+        emb = self.embed(all_faces)
         # Compute the distances to the reference embedding
-        vectors = emb[1:, :] - emb[0, :]
+        vectors = emb - self.ref_embedding
         distances = np.linalg.norm(vectors, axis=1)
         return distances
+
+    def close(self):
+        ''' Release the session and the preprocessing pool. '''
+        self.sess.close()
+        self.pool.shutdown(wait=False)
@@ -4,17 +4,25 @@
 
 __author__ = '@naxvm'
 
+import os
+import signal
 import threading
 import time
 from datetime import datetime
 
-import utils
+import yaml
 from cprint import cprint
-from utils import crop_face
-from imageio import imread
 from faced import FaceDetector
+from Perception.Net import enrollment
+from Perception.Net.degradation import LoadMonitor
+from Perception.Net.face_quality import FaceQualityGate
 from Perception.Net.facenet import FaceNet
 from Perception.Net.detection_network import DetectionNetwork
+from scheduler import RateScheduler
+
+# Networks which can be swapped at runtime: kind -> key on the Networks config
+SWAP_KINDS = {'detector': 'DetectionModel', 'encoder': 'FaceEncoderModel'}
+RELEASE_DELAY = 5  # s, before closing a swapped session (inferences in flight might still use it)
 
 
 class NetworksController(threading.Thread):
@@ -29,14 +37,28 @@ class NetworksController(threading.Thread):
         # Arguments for the networks
         self.nets_cfg = nets_cfg
         self.ref_img_path = ref_img_path
+        self.enrollment_path = nets_cfg.get('RefEnrollment', enrollment.enrollmentPath(ref_img_path))
 
         # Placeholders
         self.pdet_network = None
+        self.pdet_primary = None
+        self.pdet_fallback = None
+        # Optional downgrade to a lighter detector under load
+        self.load_monitor = None
+        if 'Fallback' in nets_cfg:
+            self.load_monitor = LoadMonitor(nets_cfg['Fallback'])
+        # Serializes the changes of networks and their log (several pipeline workers may detect at once)
+        self.detector_lock = threading.Lock()
         self.fdet_network = None
         self.fenc_network = None
+        # Optional face quality filtering before the encoding
+        self.face_gate = None
+        if 'FaceQuality' in nets_cfg:
+            self.face_gate = FaceQualityGate(nets_cfg['FaceQuality'])
 
         self.image = []
         self.depth = []
+        self.frame = 0
 
         self.persons = []
         self.faces = []
@@ -49,13 +71,27 @@ class NetworksController(threading.Thread):
         # Benchmarking purposes
         self.benchmark = benchmark
         self.total_times = {}
+        self.face_counts = {}
+        self.face_prep_times = {}
         self.t_pers_det = None
         self.t_face_det = None
         self.t_face_enc = None
         self.ttfi = None
+        self.ref_enrolled = False
+        self.model_switches = []
+
+        # Hot swap of models, requested through the API, the control file or SIGUSR1
+        self.swap_lock = threading.Lock()
+        self.pending_swaps = {}
+        self.loading = set()
+        self.control_file = nets_cfg.get('ControlFile')
+        self.control_mtime = None
+        if self.control_file is not None and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, self._forceControlRead)
 
         # self.cam = None
         self.tracker = None
+        self.scheduler = None
         self.debug = debug
 
     def createPersonDetector(self):
@@ -65,9 +101,16 @@ class NetworksController(threading.Thread):
         pdet_network = DetectionNetwork(self.nets_cfg['Arch'], input_shape, self.nets_cfg['DetectionModel'])
         elapsed = datetime.now() - start
         # Assign the attributes
-        self.pdet_network = pdet_network
+        self.pdet_network = self.pdet_primary = pdet_network
         self.t_pers_det = elapsed
 
+        if self.load_monitor is not None:
+            # Pre-load the lighter model, so the switch is immediate
+            fb_cfg = self.nets_cfg['Fallback']
+            fb_shape = (fb_cfg.get('DetectionHeight', input_shape[0]), fb_cfg.get('DetectionWidth', input_shape[1]), 3)
+            self.pdet_fallback = DetectionNetwork(fb_cfg.get('Arch', self.nets_cfg['Arch']), fb_shape,
+                                                  fb_cfg['DetectionModel'])
+
     def createFaceDetector(self):
         """Instantiate the face detection network."""
         start = datetime.now()
@@ -86,6 +129,21 @@ class NetworksController(threading.Thread):
         self.fenc_network = fenc_network
         self.t_face_enc = elapsed
 
+    def setReferenceFace(self):
+        """Load the reference embedding from the enrollment file, or compute
+        it (and refresh the file) if it is missing or stale."""
+        model_path = self.nets_cfg['FaceEncoderModel']
+        ref_embedding = enrollment.loadEnrollment(self.enrollment_path, self.ref_img_path, model_path)
+        if ref_embedding is not None:
+            cprint.ok(f'Reference face loaded from {self.enrollment_path}')
+            self.fenc_network.setReferenceEmbedding(ref_embedding)
+            self.ref_enrolled = True
+            return
+
+        cprint.warn('Computing the reference face embedding...')
+        ref_embedding = enrollment.computeReferenceEmbedding(self.fdet_network, self.fenc_network, self.ref_img_path)
+        enrollment.saveEnrollment(self.enrollment_path, ref_embedding, self.ref_img_path, model_path)
+
     def setTracker(self, tracker):
         """Set the tracker (CPU thread to be updated with the
         latest inferences."""
@@ -93,6 +151,158 @@ class NetworksController(threading.Thread):
         self.image = self.tracker.image
         self.depth = self.tracker.depth
 
+    def requestSwap(self, kind, model_path):
+        """Load a new person detector ('detector') or face encoder ('encoder')
+        in the background. It will be swapped in between iterations."""
+        if kind not in SWAP_KINDS:
+            cprint.warn(f'Unknown kind of network to swap: {kind} (choose among {list(SWAP_KINDS)})')
+            return
+        with self.swap_lock:
+            if (kind, model_path) in self.loading:
+                return
+            self.loading.add((kind, model_path))
+        cprint.info(f'Loading {model_path} as the new {kind}...')
+        threading.Thread(target=self._loadForSwap, args=(kind, model_path), daemon=True).start()
+
+    def _loadForSwap(self, kind, model_path):
+        """Load and warm up a network, leaving it ready to be swapped."""
+        start = datetime.now()
+        try:
+            if kind == 'detector':
+                # The constructor already performs the first (slower) inference
+                input_shape = (self.nets_cfg['DetectionHeight'], self.nets_cfg['DetectionWidth'], 3)
+                network = DetectionNetwork(self.nets_cfg['Arch'], input_shape, model_path)
+            else:
+                # The reference embedding has to be computed with the new encoder
+                network = FaceNet(model_path)
+                ref_embedding = enrollment.computeReferenceEmbedding(self.fdet_network, network, self.ref_img_path)
+                enrollment.saveEnrollment(self.enrollment_path, ref_embedding, self.ref_img_path, model_path)
+        except Exception as e:
+            # Keep running with the current network (and allow retrying this one)
+            cprint.err(f'Could not load {model_path} as the new {kind}: {e}')
+            with self.swap_lock:
+                self.loading.discard((kind, model_path))
+            return
+        with self.swap_lock:
+            self.loading.discard((kind, model_path))
+            self.pending_swaps[kind] = (network, model_path, datetime.now() - start)
+
+    def _forceControlRead(self, signum, frame):
+        self.control_mtime = None
+
+    def checkControlFile(self):
+        """Request the swaps indicated on the control file, if it was modified."""
+        try:
+            mtime = os.stat(self.control_file).st_mtime
+        except OSError:
+            return
+        if mtime == self.control_mtime:
+            return
+        self.control_mtime = mtime
+        with open(self.control_file, 'r') as f:
+            control = yaml.safe_load(f) or {}
+        for kind, key in SWAP_KINDS.items():
+            model_path = control.get(key)
+            if model_path is not None and model_path != self.nets_cfg[key]:
+                self.requestSwap(kind, model_path)
+
+    def applySwaps(self, frame=None):
+        """Swap in the networks which finished loading (called between iterations)."""
+        if self.control_file is not None:
+            self.checkControlFile()
+        if not self.pending_swaps:
+            return
+        with self.swap_lock:
+            pending, self.pending_swaps = self.pending_swaps, {}
+
+        for kind, (network, model_path, load_time) in pending.items():
+            with self.detector_lock:
+                if kind == 'detector':
+                    old_network = self.pdet_primary
+                    self.pdet_primary = network
+                    if self.pdet_network is old_network:
+                        self.pdet_network = network
+                else:
+                    old_network = self.fenc_network
+                    self.fenc_network = network
+                key = SWAP_KINDS[kind]
+                self.model_switches.append({
+                    'Frame': self.frame if frame is None else frame,
+                    'From': self.nets_cfg[key],
+                    'To': model_path,
+                    'LoadTime': f'{load_time.total_seconds() * 1000.0:.4f} ms',
+                })
+            self.nets_cfg[key] = model_path
+            # Release the old session when no inference can be using it anymore
+            threading.Timer(RELEASE_DELAY, old_network.close).start()
+            cprint.ok(f'Swapped the {kind}: now using {model_path}')
+
+    def preprocessPersons(self, image, frame=None):
+        """Resize an image (of the given frame) for the current person detector."""
+        # First stage of an iteration of the pipeline
+        self.applySwaps(frame)
+        pdet_network = self.pdet_network
+        return pdet_network, pdet_network.preprocess(image)
+
+    def detectPersons(self, image, det_input=None, frame=None):
+        """Run the person detector (on the preprocessPersons output, if provided)
+        on the image of a frame (the current one by default). Return the boxes and
+        the inference time."""
+        pdet_network = self.pdet_network
+        img_rsz = None
+        if det_input is not None and det_input[0] is pdet_network:
+            # (otherwise, it was preprocessed for a model switched meanwhile)
+            img_rsz = det_input[1]
+        persons, elapsed = pdet_network.predict(image, img_rsz)
+
+        if self.load_monitor is not None:
+            with self.detector_lock:
+                if self.load_monitor.update(elapsed.total_seconds() * 1000.0):
+                    self.switchDetector(self.frame if frame is None else frame)
+        return persons, elapsed
+
+    def switchDetector(self, frame):
+        """Swap between the primary and the fallback person detectors (holding the detector lock)."""
+        degrade = not self.load_monitor.degraded
+        new_network = self.pdet_fallback if degrade else self.pdet_primary
+        switch = {
+            'Frame': frame,
+            'From': 'primary' if degrade else 'fallback',
+            'To': 'fallback' if degrade else 'primary',
+            'RollingLatency': f'{self.load_monitor.latency:.4f} ms',
+        }
+        self.pdet_network = new_network
+        self.load_monitor.switched()
+        self.model_switches.append(switch)
+        cprint.warn(f'Person detector switched to the {switch["To"]} model ({switch["RollingLatency"]})')
+
+    def detectFaces(self, image, persons):
+        """Run the face detector and keep the faces worth encoding.
+        Return them, and the number of raw and confident detections."""
+        face_detections = self.fdet_network.predict(image)
+        n_detections = len(face_detections) if isinstance(face_detections, list) else 1
+
+        # Just confident faces
+        confident_faces = list(filter(lambda f: f[-1] > 0.9, face_detections))
+        # And, if requested, only those good enough to be encoded
+        if self.face_gate is not None:
+            faces = self.face_gate.filter(image, confident_faces, persons)
+        else:
+            faces = confident_faces
+        return faces, n_detections, len(confident_faces)
+
+    def encodeFaces(self, image, faces):
+        """Compute the distances of the faces to the reference one.
+        Return them, and the time spent cropping and preprocessing the faces."""
+        step_time = datetime.now()
+        ### Face cropping and preprocessing (batched) ###
+        prep_faces = self.fenc_network.preprocessBatch(image, faces)
+        prep_elapsed = datetime.now() - step_time
+
+        ### Face similarities ###
+        similarities = self.fenc_network.distancesToRef(prep_faces, preprocess=False)
+        return similarities, prep_elapsed
+
     def iterate(self):
         """Function to be called in the loop."""
 
@@ -101,13 +311,14 @@ class NetworksController(threading.Thread):
         #     time.sleep(PERIOD - elapsed_)
         # start = time.time()
         iter_info = []
+        self.applySwaps()
         # Fetch the images
         self.is_activated = self.tracker.is_activated
         try:
             # self.image, self.depth = self.cam.getImages()
             # We get it from the tracker, in order not to consume the
             # iterator if the images come from a ROSBag
-            self.image, self.depth = self.tracker.getImages()
+            self.image, self.depth, self.frame = self.tracker.getFrame()
         except StopIteration:
             self.is_activated = False
             return
@@ -116,56 +327,55 @@ class NetworksController(threading.Thread):
             iter_start = step_time
 
         ### Person detection ###
-        self.persons, elapsed = self.pdet_network.predict(self.image)
+        self.persons, elapsed = self.detectPersons(self.image)
         if self.benchmark:
             iter_info.append([elapsed, len(self.persons)])
             step_time = datetime.now()
 
-        ### Face detection and cropping ###
-        face_detections = self.fdet_network.predict(self.image)
+        ### Face detection and filtering ###
+        self.faces, n_detections, n_confident = self.detectFaces(self.image, self.persons)
         if self.benchmark:
             elapsed = datetime.now() - step_time
-            iter_info.append([elapsed, len(face_detections) if isinstance(face_detections, list) else 1])
-
-        # Just confident faces
-        self.faces = list(filter(lambda f: f[-1] > 0.9, face_detections))
-        faces_cropped = [utils.crop_face(self.image, fdet) for fdet in self.faces]
-        if self.benchmark: step_time = datetime.now()
+            iter_info.append([elapsed, n_detections])
+            step_time = datetime.now()
 
         ### Face similarities ###
-        self.similarities = self.fenc_network.distancesToRef(faces_cropped)
+        self.similarities, prep_elapsed = self.encodeFaces(self.image, self.faces)
         if self.benchmark:
-            elapsed = datetime.now() - step_time
+            elapsed = datetime.now() - step_time - prep_elapsed
             iter_info.append([elapsed, len(self.similarities)])
+            self.face_prep_times[self.frame] = prep_elapsed
+            self.face_counts[self.frame] = (len(self.faces), n_confident - len(self.faces))
 
         # Make the tracking thread to update the persons
-
-        self.tracker.updateWithDetections(self.persons, self.faces, self.similarities)
+        # (tagged with their source frame, so they get propagated to the current one)
+        self.tracker.updateWithDetections(self.persons, self.faces, self.similarities, frame=self.frame)
 
         # Finishing the loop
         if self.benchmark:
             iter_elapsed = datetime.now() - iter_start
             self.last_elapsed = iter_elapsed
             iter_info.append(iter_elapsed)
-            self.total_times[self.tracker.frame_counter] = iter_info
-
-
-    def run(self):
-        """Main method of the thread."""
+            self.total_times[self.frame] = iter_info
 
-        # Create the networks
+    def createNetworks(self):
+        """Load the networks and the reference face."""
         zero_time = datetime.now()
         self.createPersonDetector()
         self.createFaceDetector()
         self.createFaceEncoder()
 
         # Set the reference face
-        ref_img = imread(self.ref_img_path)
-        ref_box = self.fdet_network.predict(ref_img)
-        ref_face = crop_face(ref_img, ref_box)
-        self.fenc_network.setReferenceFace(ref_face)
+        self.setReferenceFace()
 
         self.ttfi = datetime.now() - zero_time
+
+    def run(self):
+        """Main method of the thread."""
+
+        # Create the networks
+        self.createNetworks()
+
         # Indicate we are ready to go
         self.is_activated = True
         self.tracker.is_activated = True
@@ -175,8 +385,13 @@ class NetworksController(threading.Thread):
         if self.debug:
             # The control will be carried by the main thread
             return
+        # Infer only when the tracker has a new frame
+        self.scheduler = RateScheduler('NetworksController', notifier=self.tracker.frames)
         while self.is_activated:
-            self.iterate()
+            if self.scheduler.wait():
+                self.iterate()
+            else:
+                self.is_activated = self.tracker.is_activated
 
     def close_all(self):
         """Function to stop the inferences."""
@@ -184,7 +399,9 @@ class NetworksController(threading.Thread):
         # Finish current inferences
         time.sleep(1)
 
-        self.pdet_network.sess.close()
+        self.pdet_primary.close()
+        if self.pdet_fallback is not None:
+            self.pdet_fallback.close()
         self.fdet_network.sess.close()
-        self.fenc_network.sess.close()
+        self.fenc_network.close()
         print('All the sessions were closed.')
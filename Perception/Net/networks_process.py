@@ -0,0 +1,306 @@
+#
+# Created on Oct. 2026
+#
+# Run the NetworksController on a separate process, so its Python-side work
+# does not compete with the tracker for the GIL. The frames travel through a
+# shared-memory ring buffer, and the detections come back through a queue.
+
+__author__ = '@naxvm'
+
+import _thread
+import ctypes
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+import time
+
+import numpy as np
+from cprint import cprint
+
+RING_SLOTS = 4         # frames kept on the shared ring buffer
+POLL_PERIOD = 0.005    # s, maximum wait for results before feeding a new frame
+READY_TIMEOUT = 300    # s, maximum time to wait for the networks to be loaded
+READY_POLL = 0.5       # s, period to check the networks process while it loads them
+
+
+class FrameRingBuffer:
+    """Single-writer ring buffer of images on shared memory. Each slot
+    stores the sequence number of its frame, which is set to -1 while
+    it is being written (so the readers can discard torn frames)."""
+
+    def __init__(self, shape, n_slots=RING_SLOTS, ctx=mp):
+        self.shape = tuple(shape)
+        self.n_slots = n_slots
+        frame_size = int(np.prod(self.shape))
+        self.buffer = ctx.RawArray(ctypes.c_uint8, n_slots * frame_size)
+        self.seqs = ctx.RawArray(ctypes.c_int64, [-1] * n_slots)
+        self.latest = ctx.RawValue(ctypes.c_int64, -1)
+        self.new_frame = ctx.Event()
+        self.written = 0
+        self._frames = None
+
+    def __getstate__(self):
+        # The numpy view can't be pickled: it is rebuilt on the other process
+        state = self.__dict__.copy()
+        state['_frames'] = None
+        return state
+
+    @property
+    def frames(self):
+        if self._frames is None:
+            self._frames = np.frombuffer(self.buffer, dtype=np.uint8).reshape(self.n_slots, *self.shape)
+        return self._frames
+
+    def write(self, image, seq):
+        """Copy a new frame into the next slot."""
+        slot = self.written % self.n_slots
+        self.seqs[slot] = -1
+        self.frames[slot] = image
+        self.seqs[slot] = seq
+        self.latest.value = slot
+        self.written += 1
+        self.new_frame.set()
+
+    def read(self, last_seq, timeout=None):
+        """Return a copy of the latest frame and its sequence number, waiting
+        until it is newer than last_seq. (None, last_seq) if there is none."""
+        while True:
+            slot = self.latest.value
+            if slot >= 0:
+                seq = self.seqs[slot]
+                if seq > last_seq:
+                    image = self.frames[slot].copy()
+                    if self.seqs[slot] == seq:
+                        return image, seq
+                    # The writer wrapped around while copying: retry
+                    continue
+            if not self.new_frame.wait(timeout):
+                return None, last_seq
+            self.new_frame.clear()
+
+
+class _RingBufferTracker:
+    """Stand-in for the PeopleTracker inside the networks process: it serves
+    the frames from the ring buffer and sends the detections back."""
+
+    def __init__(self, ring, results, active):
+        self.ring = ring
+        self.results = results
+        self.active = active
+        self.frame_counter = -1
+        self.image = np.zeros(ring.shape, dtype=np.uint8)
+        self.depth = None
+
+    @property
+    def is_activated(self):
+        return bool(self.active.value)
+
+    @is_activated.setter
+    def is_activated(self, value):
+        # The activation is owned by the main process
+        pass
+
+    def start(self):
+        pass
+
+    def getFrame(self):
+        image = None
+        while image is None:
+            if not self.is_activated:
+                raise StopIteration
+            image, self.frame_counter = self.ring.read(self.frame_counter, timeout=0.5)
+        self.image = image
+        return self.image, self.depth, self.frame_counter
+
+    def updateWithDetections(self, boxes, faces, similarities, frame=None):
+        self.results.put(('dets', frame, boxes, faces, similarities))
+
+
+def _networksWorker(nets_cfg, ref_img_path, benchmark, ring, results, active, control_conn):
+    """Main function of the networks process."""
+    # Imported here, so TensorFlow is only loaded on this process
+    from Perception.Net.networks_controller import NetworksController
+
+    cores = nets_cfg.get('ProcessCores')
+    if cores is not None:
+        os.sched_setaffinity(0, cores)
+
+    tracker = _RingBufferTracker(ring, results, active)
+    # In debug mode, the controller only configures itself
+    nets_c = NetworksController(nets_cfg, ref_img_path, benchmark=benchmark, debug=True)
+    nets_c.setTracker(tracker)
+    nets_c.run()
+    results.put(('ready', nets_c.t_pers_det, nets_c.t_face_det, nets_c.t_face_enc, nets_c.ttfi,
+                 nets_c.ref_enrolled))
+
+    while tracker.is_activated:
+        while control_conn.poll():
+            # SIGUSR1 received by the main process: read the control file again
+            control_conn.recv()
+            nets_c.control_mtime = None
+        nets_c.iterate()
+        frame = tracker.frame_counter
+        # Send the benchmark info (and forget it, it is stored on the main process)
+        results.put(('stats', frame, nets_c.total_times.pop(frame, None), nets_c.face_counts.pop(frame, None),
+                     nets_c.face_prep_times.pop(frame, None), nets_c.last_elapsed, nets_c.model_switches))
+        nets_c.model_switches = []
+
+    nets_c.close_all()
+    results.put(('closed',))
+
+
+class NetworksProcess(threading.Thread):
+
+    def __init__(self, nets_cfg, ref_img_path, benchmark=False, debug=False):
+        """ Drop-in replacement for the NetworksController, running the inferences
+        on a separate process. This thread feeds it and collects its results. """
+
+        super(NetworksProcess, self).__init__()
+        self.name = 'NetworksProcessThread'
+        self.daemon = True
+
+        self.nets_cfg = nets_cfg
+        self.ref_img_path = ref_img_path
+        self.ctx = mp.get_context('spawn')
+        self.ring = None
+        self.results = self.ctx.Queue()
+        self.active = self.ctx.RawValue(ctypes.c_bool, True)
+        # Requests to read the control file again (SIGUSR1 reaches this process, not the networks one)
+        self.control_recv, self.control_send = self.ctx.Pipe(duplex=False)
+        if nets_cfg.get('ControlFile') is not None and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, self._forwardControlRead)
+        self.process = None
+        self.last_fed = -1
+
+        self.persons = []
+        self.faces = []
+        self.similarities = []
+
+        # Timing purposes
+        self.last_elapsed = 0
+        self.is_activated = False
+
+        # Benchmarking purposes
+        self.benchmark = benchmark
+        self.total_times = {}
+        self.face_counts = {}
+        self.face_prep_times = {}
+        self.t_pers_det = None
+        self.t_face_det = None
+        self.t_face_enc = None
+        self.ttfi = None
+        self.ref_enrolled = False
+        self.model_switches = []
+
+        self.tracker = None
+        # The pace is set by the networks process (this thread blocks on its results)
+        self.scheduler = None
+        self.debug = debug
+
+    def _forwardControlRead(self, signum, frame):
+        self.control_send.send('control')
+
+    def setTracker(self, tracker):
+        """Set the tracker (CPU thread to be updated with the
+        latest inferences."""
+        self.tracker = tracker
+        self.ring = FrameRingBuffer(np.shape(tracker.image), ctx=self.ctx)
+
+    def feed(self):
+        """Copy the latest tracker frame into the ring buffer, if it is new."""
+        if self.tracker.frame_counter != self.last_fed:
+            image, _, frame = self.tracker.getFrame()
+            self.ring.write(image, frame)
+            self.last_fed = frame
+
+    def handleResult(self, result):
+        """Process a message coming from the networks process."""
+        kind = result[0]
+        if kind == 'dets':
+            _, frame, self.persons, self.faces, self.similarities = result
+            self.tracker.updateWithDetections(self.persons, self.faces, self.similarities, frame=frame)
+        elif kind == 'stats':
+            _, frame, iter_info, face_count, face_prep_time, self.last_elapsed, switches = result
+            self.model_switches += switches
+            if iter_info is not None:
+                self.total_times[frame] = iter_info
+            if face_count is not None:
+                self.face_counts[frame] = face_count
+            if face_prep_time is not None:
+                self.face_prep_times[frame] = face_prep_time
+        elif kind == 'ready':
+            _, self.t_pers_det, self.t_face_det, self.t_face_enc, self.ttfi, self.ref_enrolled = result
+            # Indicate we are ready to go
+            self.is_activated = True
+            self.tracker.is_activated = True
+            self.tracker.start()
+        elif kind == 'closed':
+            self.is_activated = False
+
+    def iterate(self):
+        """Feed the latest frame and handle the pending results."""
+        if not self.tracker.is_activated:
+            self.is_activated = False
+            return
+        self.feed()
+        while True:
+            try:
+                self.handleResult(self.results.get_nowait())
+            except queue.Empty:
+                break
+
+    def run(self):
+        """Main method of the thread."""
+        self.process = self.ctx.Process(target=_networksWorker, name='NetworksProcess',
+                                        args=(self.nets_cfg, self.ref_img_path, self.benchmark,
+                                              self.ring, self.results, self.active, self.control_recv),
+                                        daemon=True)
+        self.process.start()
+        # Feed the first frame while the networks are being loaded
+        self.feed()
+        self.handleResult(self.waitReady())
+        time.sleep(2)
+
+        if self.debug:
+            # The control will be carried by the main thread
+            return
+        while self.is_activated:
+            if not self.tracker.is_activated:
+                self.is_activated = False
+                break
+            self.feed()
+            try:
+                self.handleResult(self.results.get(timeout=POLL_PERIOD))
+            except queue.Empty:
+                pass
+
+    def waitReady(self):
+        """Wait for the networks process to load the models, checking that it is still alive."""
+        deadline = time.monotonic() + READY_TIMEOUT
+        while True:
+            try:
+                return self.results.get(timeout=READY_POLL)
+            except queue.Empty:
+                pass
+            if not self.process.is_alive():
+                error = f'The networks process died while loading the models (exit code {self.process.exitcode})'
+            elif time.monotonic() > deadline:
+                error = f'The networks process did not load the models in {READY_TIMEOUT} s'
+            else:
+                continue
+            # Stop the main thread too (it is waiting for the networks to be ready)
+            _thread.interrupt_main()
+            cprint.fatal(error, interrupt=True)
+
+    def close_all(self):
+        """Function to stop the inferences."""
+        self.is_activated = False
+        self.active.value = False
+        self.ring.new_frame.set()
+        if self.process is not None:
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                self.process.terminate()
+        print('The networks process was closed.')
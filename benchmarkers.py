@@ -1,4 +1,5 @@
 import argparse
+import csv
 import numpy as np
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
@@ -17,6 +18,11 @@ from cprint import cprint
 FILENAME_FORMAT = '%Y%m%d %H%M%S'
 TO_MS = lambda x: x.seconds*1000.0 + x.microseconds/1000.0 # Auxiliary vectorized function
 TO_MS_VEC = np.vectorize(TO_MS)
+# Graphs of the benchmark: (key on plot_times, title, file name)
+PLOTS = [('iter', 'Total iteration time', 'iterations.png'),
+         ('pdet', 'Person detection time', 'person_detections.png'),
+         ('fdet', 'Face detection time', 'face_detections.png'),
+         ('fenc', 'Face encoding time', 'face_encoding.png')]
 
 
 class FollowPersonBenchmarker:
@@ -28,7 +34,16 @@ class FollowPersonBenchmarker:
         self.load_times = None
         self.detection_stats = None
         self.tracking_stats = None
+        self.face_stats = None
+        self.scheduling_stats = None
+        self.pipeline_stats = None
+        self.model_switches = None
+        self.tracker_settings = None
         self.iterations = None
+        self.trajectories = None
+        # Records of the tracks, written along the run: (file, csv writer), and the span of every track
+        self.trajectories_out = None
+        self.trajectory_spans = {}
 
         self.plot_times = {}
         # Create the benchmark folder
@@ -64,7 +79,7 @@ class FollowPersonBenchmarker:
         }
         self.config = config
 
-    def makeLoadTimes(self, t_pers_det, t_face_det, t_face_enc, ttfi):
+    def makeLoadTimes(self, t_pers_det, t_face_det, t_face_enc, ttfi, ref_enrolled=False):
         """Build the load times section for the benchmark report."""
 
         load_times = {
@@ -72,10 +87,11 @@ class FollowPersonBenchmarker:
             '2.- FaceDetectionNetworkLoad':   TO_MS(t_face_det),
             '3.- FaceEncodingNetworkLoad':    TO_MS(t_face_enc),
             '4.- TTFI':                       TO_MS(ttfi),
+            '5.- RefFromEnrollment':          ref_enrolled,
         }
         self.load_times = load_times
 
-    def makeDetectionStats(self, frames_times):
+    def makeDetectionStats(self, frames_times, face_prep_times=None):
         """Build the detection statistics section for the benchmark report."""
 
         # Convert the times to an array
@@ -116,6 +132,14 @@ class FollowPersonBenchmarker:
                 '2.- MAD': f'{mad(iter_times):.4f} ms',
             }
         }
+        if face_prep_times:
+            # Batched face cropping and resizing, measured apart from the encoding
+            fprep_times = np.array([TO_MS(dt) for dt in face_prep_times.values()])
+            self.plot_times['fprep'] = fprep_times
+            detection_stats['5.- FacePreprocessing'] = {
+                '1.- Median': f'{np.median(fprep_times):.4f} ms',
+                '2.- MAD': f'{mad(fprep_times):.4f} ms',
+            }
         self.detection_stats = detection_stats
 
     def makeTrackingStats(self, tracked_persons, frames_with_ref):
@@ -127,7 +151,67 @@ class FollowPersonBenchmarker:
         }
         self.tracking_stats = tracking_stats
 
-    def makeIters(self, frames_times, frames_numtrackings, frames_errors, ref_coords, frames_responses):
+    def makeFaceStats(self, face_counts):
+        """Build the face quality section for the benchmark report (encoded vs skipped faces)."""
+        counts = np.array(list(face_counts.values()), dtype=int).reshape(-1, 2)
+
+        face_stats = {
+            '1.- EncodedFaces': int(counts[:, 0].sum()),
+            '2.- SkippedFaces': int(counts[:, 1].sum()),
+        }
+        self.face_stats = face_stats
+
+    def makeSchedulingStats(self, schedulers):
+        """Build the scheduling section (deadline misses, overruns, jitter) for the benchmark report."""
+        self.scheduling_stats = {sched.name: sched.stats() for sched in schedulers if sched is not None}
+
+    def makeModelSwitches(self, model_switches):
+        """Log the switches of person detection model (graceful degradation) for the benchmark report."""
+        self.model_switches = model_switches
+
+    def makeTrackerSettings(self, settings_changes):
+        """Log the changes of the tracker settings (time budget adaptation) for the benchmark report."""
+        self.tracker_settings = settings_changes
+
+    def makePipelineStats(self, stages_stats):
+        """Build the pipeline section (throughput and latency per stage) for the benchmark report."""
+        self.pipeline_stats = stages_stats
+
+    def logTrajectory(self, track_id, frames, stamps, boxes, sims):
+        """Append some records of a track (frames, boxes and face similarities) to trajectories.csv.
+        It is called along the run, so the whole trajectories are saved without keeping them in memory."""
+        if self.trajectories_out is None:
+            out_file = open(path.join(self.dirname, 'trajectories.csv'), 'w', newline='')
+            writer = csv.writer(out_file)
+            writer.writerow(['Id', 'Frame', 'Stamp', 'X', 'Y', 'W', 'H', 'Similarity'])
+            self.trajectories_out = (out_file, writer)
+        _, writer = self.trajectories_out
+        for frame, stamp, box, sim in zip(frames, stamps, boxes, sims):
+            writer.writerow([track_id, frame, f'{stamp:.4f}'] + [f'{coord:.1f}' for coord in box] +
+                            ['' if np.isnan(sim) else f'{sim:.4f}'])
+        first, _, n_records = self.trajectory_spans.get(track_id, (int(frames[0]), 0, 0))
+        self.trajectory_spans[track_id] = (first, int(frames[-1]), n_records + len(frames))
+
+    def makeTrajectories(self):
+        """Close trajectories.csv, and summarize the span of each track for the benchmark report."""
+        if self.trajectories_out is not None:
+            self.trajectories_out[0].close()
+            self.trajectories_out = None
+        self.trajectories = [{
+            '1.- Id': track_id,
+            '2.- FirstFrame': first,
+            '3.- LastFrame': last,
+            '4.- Records': n_records,
+        } for track_id, (first, last, n_records) in sorted(self.trajectory_spans.items())]
+
+    def saveDetectionLog(self, detection_log):
+        """Save the detections applied to the tracker, to replay the run offline (see tracker_replay.py)."""
+        dump_file = path.join(self.dirname, 'detections.pkl')
+        with open(dump_file, 'wb') as f:
+            pickle.dump(detection_log, f)
+
+    def makeIters(self, frames_times, frames_numtrackings, frames_errors, ref_coords, frames_responses,
+                  face_counts=None, face_prep_times=None):
         """Write the iterations for each processed frame in the benchmark."""
 
         iterations = []
@@ -151,6 +235,10 @@ class FollowPersonBenchmarker:
                     '1.- Elapsed': f'{TO_MS(times[2][0]):.4f} ms',
                     '2.- Number': times[2][1],
             }
+            if face_counts is not None and frame in face_counts:
+                frame_info['4.- FaceEncoding']['3.- Skipped'] = face_counts[frame][1]
+            if face_prep_times is not None and frame in face_prep_times:
+                frame_info['4.- FaceEncoding']['4.- Preprocessing'] = f'{TO_MS(face_prep_times[frame]):.4f} ms'
 
             frame_info['5.- NeuralTime'] = f'{TO_MS(times[3]):.4f} ms'
 
@@ -193,8 +281,14 @@ class FollowPersonBenchmarker:
                 '2.- LoadTimes': self.load_times,
                 '3.- DetectionStats': self.detection_stats,
                 '4.- TrackingStats': self.tracking_stats,
+                '5.- FaceStats': self.face_stats,
+                '6.- SchedulingStats': self.scheduling_stats,
+                '7.- PipelineStats': self.pipeline_stats,
+                '8.- ModelSwitches': self.model_switches,
+                '9.- TrackerSettings': self.tracker_settings,
             },
-            '2.- Iterations': self.iterations
+            '2.- Iterations': self.iterations,
+            '3.- Trajectories': self.trajectories,
         }
 
         benchmark_name = path.join(self.dirname, 'benchmark.yml')
@@ -205,54 +299,20 @@ class FollowPersonBenchmarker:
 
         print(f'Saved on {benchmark_name}')
 
-        # Graphs spanning ± 2σ from mean
-        ## Total iteration time
-        fig, ax = plt.subplots()
-        times = self.plot_times['iter']
-        ax.plot(times)
-        ylim = [max([0, times.mean() - 2*times.std()]), times.mean() + 2*times.std()]
-        ax.set_ylim(ylim)
-        ax.set_title('Total iteration time')
-        ax.set_xlabel('Iteration')
-        ax.set_ylabel('Time (ms)')
-        figname = path.join(self.dirname, 'iterations.png')
-        fig.savefig(figname)
-
-        ## Person detection time
-        fig, ax = plt.subplots()
-        times = self.plot_times['pdet']
-        ax.plot(times)
-        ylim = [max([0, times.mean() - 2*times.std()]), times.mean() + 2*times.std()]
-        ax.set_ylim(ylim)
-        ax.set_title('Person detection time')
-        ax.set_xlabel('Iteration')
-        ax.set_ylabel('Time (ms)')
-        figname = path.join(self.dirname, 'person_detections.png')
-        fig.savefig(figname)
-
-        ## Face detection time
-        fig, ax = plt.subplots()
-        times = self.plot_times['fdet']
-        ax.plot(times)
-        ylim = [max([0, times.mean() - 2*times.std()]), times.mean() + 2*times.std()]
-        ax.set_ylim(ylim)
-        ax.set_title('Face detection time')
-        ax.set_xlabel('Iteration')
-        ax.set_ylabel('Time (ms)')
-        figname = path.join(self.dirname, 'face_detections.png')
-        fig.savefig(figname)
-
-        ## Face encoding time
-        fig, ax = plt.subplots()
-        times = self.plot_times['fenc']
-        ax.plot(times)
-        ylim = [max([0, times.mean() - 2*times.std()]), times.mean() + 2*times.std()]
-        ax.set_ylim(ylim)
-        ax.set_title('Face encoding time')
-        ax.set_xlabel('Iteration')
-        ax.set_ylabel('Time (ms)')
-        figname = path.join(self.dirname, 'face_encoding.png')
-        fig.savefig(figname)
+        # Graphs spanning ± 2σ from mean (for the measured times)
+        for key, title, filename in PLOTS:
+            if key not in self.plot_times:
+                continue
+            fig, ax = plt.subplots()
+            times = self.plot_times[key]
+            ax.plot(times)
+            ylim = [max([0, times.mean() - 2*times.std()]), times.mean() + 2*times.std()]
+            ax.set_ylim(ylim)
+            ax.set_title(title)
+            ax.set_xlabel('Iteration')
+            ax.set_ylabel('Time (ms)')
+            figname = path.join(self.dirname, filename)
+            fig.savefig(figname)
 
         # Save the times dict (for further inspection)
         dump_file = path.join(self.dirname, 'plot_times.pkl')
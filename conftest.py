@@ -0,0 +1 @@
+# Lets the tests import the repo modules (Actuation, utils...) from the root
@@ -5,6 +5,7 @@
 __author__ = '@naxvm'
 
 import argparse
+from datetime import datetime, timedelta
 from os import path
 
 import numpy as np
@@ -14,20 +15,20 @@ import cv2
 import rospy
 import utils
 from Actuation.people_tracker import PeopleTracker
-from Actuation.pid_controller import PIDController
+from Actuation.pid_controller import PIDController, XLIM, WLIM
 from benchmarkers import FollowPersonBenchmarker, TO_MS
+from pipeline import PipelineRuntime
+from scheduler import INPUT_TIMEOUT, RateScheduler
 from cprint import cprint  # this import is added from the GitHub source as the pip version is outdated
 # https://github.com/EVasseure/cprint
 from geometry_msgs.msg import Twist
 from kobuki_msgs.msg import Sound
 from Perception.Camera.ROSCam import IMAGE_HEIGHT, IMAGE_WIDTH, ROSCam
 from Perception.Net.networks_controller import NetworksController
+from Perception.Net.networks_process import NetworksProcess
 from Perception.Net.utils import visualization_utils as vis_utils
 from time import sleep
 
-XLIM = 0.7
-WLIM = 1
-
 DEBUG = True
 
 if __name__ == '__main__':
@@ -54,19 +55,36 @@ if __name__ == '__main__':
     else:
         cam = ROSCam(cfg['Topics'])
     rospy.init_node(cfg['NodeName'])
+    # Declarative pipeline (if provided) instead of the tracker and networks threads
+    use_pipeline = 'Pipeline' in cfg
     # Create the networks controller (thread running on the GPU)
     # It configures itself after starting
-    nets_c = NetworksController(nets_cfg, cfg['RefFace'], benchmark=True, debug=DEBUG)
+    if nets_cfg.get('UseProcess', False) and not use_pipeline:
+        # Same interface, but the inferences run on their own process
+        nets_c = NetworksProcess(nets_cfg, cfg['RefFace'], benchmark=True, debug=DEBUG)
+    else:
+        nets_c = NetworksController(nets_cfg, cfg['RefFace'], benchmark=True, debug=DEBUG)
 
     # Person tracker (thread running on the CPU)
     ptcfg = cfg['PeopleTracker']
-    p_tracker = PeopleTracker(ptcfg['Patience'], ptcfg['RefSimThr'], ptcfg['SamePersonThr'], debug=DEBUG)
+    p_tracker = PeopleTracker(ptcfg['Patience'], ptcfg['RefSimThr'], ptcfg['SamePersonThr'],
+                              association_cfg=ptcfg.get('Association'), ego_motion_cfg=ptcfg.get('EgoMotion'),
+                              motion_cfg=ptcfg.get('Motion'), budget_cfg=ptcfg.get('Budget'),
+                              trajectory_log=benchmarker.logTrajectory if benchmark else None,
+                              log_detections=benchmark, debug=DEBUG)
     p_tracker.setCam(cam)
     sleep(2)
 
     # Link the networks to the tracker, to update the references with the inferences
     nets_c.setTracker(p_tracker)
-    nets_c.start()
+    if use_pipeline:
+        # The pipeline stages will drive both of them
+        nets_c.createNetworks()
+        p_tracker.setPrior()
+        p_tracker.publish()
+        nets_c.is_activated = p_tracker.is_activated = True
+    else:
+        nets_c.start()
 
     # PID controllers
     xcfg = cfg['XController']
@@ -94,7 +112,8 @@ if __name__ == '__main__':
         # Save the configuration on the benchmarker
         benchmarker.makeConfig(nets_cfg['DetectionModel'], nets_cfg['FaceEncoderModel'], cfg['RosbagFile'], xcfg, wcfg,
                                ptcfg)
-        benchmarker.makeLoadTimes(nets_c.t_pers_det, nets_c.t_face_det, nets_c.t_face_enc, nets_c.ttfi)
+        benchmarker.makeLoadTimes(nets_c.t_pers_det, nets_c.t_face_det, nets_c.t_face_enc, nets_c.ttfi,
+                                  nets_c.ref_enrolled)
 
     # Data structures to save the results
     iteration = 0
@@ -105,6 +124,8 @@ if __name__ == '__main__':
     ref_coords = {}
 
     ref_tracked = False
+    last_version = -1
+    x_error = 0.0
     fps_str = 'N/A'
     show_images = True
 
@@ -120,57 +141,25 @@ if __name__ == '__main__':
             v_out.release()
 
 
-    # Register shutdown hook
-    rospy.on_shutdown(shtdn_hook)
-    counter = 30000
+    def control(packet):
+        """Compute the errors of the reference person on a snapshot, and send
+        the responses of the PID controllers to the robot."""
+        global ref_tracked, frames_with_ref, x_error
+        snapshot = packet['snapshot']
+        frame_counter = snapshot.frame
+        persons = snapshot.persons
 
-    while not rospy.is_shutdown():
-        if DEBUG:
-            # Debugging stuff to control the threads
-            if counter > 0:
-                p_tracker.iterate()
-                if counter % 10 == 0:
-                    nets_c.iterate()
-                counter -= 1
-            else:
-                command = input('enter thread to step [(t)racker, (n)eural, (g)ui], \n\tnumber of frames to process normally, or a command to eval (starting with >)')
-                if command.startswith('>'):
-                    eval(command[1:])
-                    continue
-                elif command == 't':
-                    p_tracker.iterate()
-                elif command == 'n':
-                    nets_c.iterate()
-                elif command.isnumeric():
-                    counter = int(command)
-
-
-        if not nets_c.is_activated:
-            rospy.signal_shutdown('ROSBag completed!')
-        image, depth = p_tracker.getImages()
-        frame_counter = p_tracker.frame_counter
-
-        ################
-        ### TRACKING ###
-        ################
-        # Forward step in the tracking using the detections
-        # print('=====')
-        # print('-main-')
-        # print(f'Detections: {len(nets_c.persons)}|{len(nets_c.faces)}')
-        # print(f'Tracker: {len(p_tracker.persons)}')
-        persons = p_tracker.persons
-
-        ################
-        #### MOVING ####
-        ################
         # Compute errors
         ref_found = False
         person = None
         for person in persons:
             if person.is_ref:
                 w_error = utils.computeWError(person.coords, IMAGE_WIDTH)
-                # The depth might not be sampleable
-                new_x_error = utils.computeXError(person.coords, depth)
+                # Distance sampled by the tracker (unless the track is newer than the last step)
+                if np.isnan(person.depth):
+                    new_x_error = utils.computeXError(person.coords, snapshot.depth)
+                else:
+                    new_x_error = person.depth
                 if new_x_error is not None:
                     x_error = new_x_error
                 ref_found = True
@@ -192,12 +181,16 @@ if __name__ == '__main__':
                 msg.linear.x = x_response
                 msg.angular.z = w_response
                 tw_pub.publish(msg)
+                # Expected camera motion, for the tracker
+                p_tracker.ego_estimator.setCommand(w_response)
         else:
             if ref_tracked and not benchmark:
                 # Sound if just lost
                 sn_pub.publish(Sound.CLEANINGSTART)
 
             ref_tracked = False
+            # No more commands are sent, so the robot stops turning
+            p_tracker.ego_estimator.setCommand(0.0)
             w_error = None
             x_error = None
             w_response = w_pid.lostResponse()
@@ -210,14 +203,22 @@ if __name__ == '__main__':
             if person is not None:
                 ref_coords[frame_counter] = person.coords
 
-        ###############
-        ### DRAWING ###
-        ###############
+        packet['responses'] = (w_response, x_response)
+        return packet
+
+    def render(packet):
+        """Draw the tracked persons and the responses over the images, and show them."""
+        global fps_str
+        snapshot = packet['snapshot']
+        frame_counter = snapshot.frame
+        image, depth = snapshot.image, snapshot.depth
+        w_response, x_response = packet['responses']
+
         # Draw the images.
         depth = 255.0 * (1 - depth / 6.0)  # 8-bit quantization of the effective Xtion range
         transformed = np.copy(image)
 
-        for person in persons:
+        for person in snapshot.persons:
             x1, y1, x2, y2 = utils.corner2Corners(person.coords)
             color = utils.BOX_COLOR[person.is_ref]
             vis_utils.draw_bounding_box_on_image_array(transformed, y1, x1, y2, x2, color=color,
@@ -227,7 +228,7 @@ if __name__ == '__main__':
                 x1, y1, x2, y2 = utils.center2Corners(face.coords)
                 vis_utils.draw_bounding_box_on_image_array(transformed, y1, x1, y2, x2, color='blue',
                                                            use_normalized_coordinates=False)
-        for kp in p_tracker.keypoints.astype(int):
+        for kp in snapshot.keypoints.astype(int):
             try:
                 x, y = kp
             except TypeError:
@@ -258,12 +259,141 @@ if __name__ == '__main__':
         if show_images:
             cv2.imshow('Output', cv2.resize(total_out, dsize=(IMAGE_WIDTH, IMAGE_HEIGHT), interpolation=cv2.INTER_CUBIC))
             cv2.waitKey(1)
-        if benchmark: v_out.write(total_out)
+        packet['output'] = total_out
+        return packet
+
+    def record(packet):
+        """Save the rendered output on the video."""
+        if benchmark:
+            v_out.write(packet['output'])
+        return packet
+
+
+    # Register shutdown hook
+    rospy.on_shutdown(shtdn_hook)
+
+    if use_pipeline:
+        last_frame_seq = 0
+
+        def source(_):
+            global last_frame_seq
+            if cam.frames is not None:
+                # Live camera: wait for a new frame instead of serving the same one again
+                seq = cam.frames.waitNewer(last_frame_seq, timeout=INPUT_TIMEOUT)
+                if seq <= last_frame_seq:
+                    return None
+                last_frame_seq = seq
+            image, depth = cam.getImages()
+            return {'image': image, 'depth': depth}
+
+        def track(packet):
+            snapshot = p_tracker.feed(packet['image'], packet['depth'])
+            return {'frame': snapshot.frame, 'image': snapshot.image, 'snapshot': snapshot}
+
+        # The networks stages record the same [elapsed, number] entries as NetworksController.iterate
+        # (on packet['times'], replaced and not appended to, as the packets are shallow copies)
+        def preprocess(packet):
+            step_time = datetime.now()
+            packet['det_input'] = nets_c.preprocessPersons(packet['image'], frame=packet['frame'])
+            packet['det_prep_elapsed'] = datetime.now() - step_time
+            return packet
+
+        def detect(packet):
+            packet['persons'], elapsed = nets_c.detectPersons(packet['image'], packet.get('det_input'),
+                                                              frame=packet['frame'])
+            packet['times'] = [[elapsed + packet.get('det_prep_elapsed', timedelta(0)), len(packet['persons'])]]
+            return packet
+
+        def face_detect(packet):
+            step_time = datetime.now()
+            packet['faces'], n_detections, packet['n_confident'] = nets_c.detectFaces(packet['image'],
+                                                                                      packet['persons'])
+            packet['times'] = packet['times'] + [[datetime.now() - step_time, n_detections]]
+            return packet
+
+        def encode(packet):
+            frame = packet['frame']
+            step_time = datetime.now()
+            packet['similarities'], prep_elapsed = nets_c.encodeFaces(packet['image'], packet['faces'])
+            if benchmark:
+                elapsed = datetime.now() - step_time - prep_elapsed
+                iter_info = packet['times'] + [[elapsed, len(packet['similarities'])]]
+                # Neural time of the frame: its stages, without the time waiting on the queues
+                neural_elapsed = sum((step[0] for step in iter_info), prep_elapsed)
+                iter_info.append(neural_elapsed)
+                nets_c.face_prep_times[frame] = prep_elapsed
+                nets_c.face_counts[frame] = (len(packet['faces']), packet['n_confident'] - len(packet['faces']))
+                nets_c.total_times[frame] = iter_info
+                nets_c.last_elapsed = neural_elapsed
+            # Detections tagged with their source frame
+            p_tracker.updateWithDetections(packet['persons'], packet['faces'], packet['similarities'],
+                                           frame=frame)
+            return packet
+
+        runtime = PipelineRuntime(cfg['Pipeline'], {'source': source, 'track': track, 'preprocess': preprocess,
+                                                    'detect': detect, 'face-detect': face_detect,
+                                                    'encode': encode, 'control': control,
+                                                    'render': render, 'record': record},
+                                  single_worker=('source', 'track', 'control', 'render', 'record'))
+        runtime.start()
+        while runtime.is_running and not rospy.is_shutdown():
+            sleep(0.1)
+        runtime.stop()
+        main_sched = None
+
+    else:
+        counter = 30000
+        # The main loop only runs when the tracker publishes something new
+        main_sched = RateScheduler('Main', notifier=p_tracker.snapshots)
+
+    while not use_pipeline and not rospy.is_shutdown():
+        if DEBUG:
+            # Debugging stuff to control the threads
+            if counter > 0:
+                p_tracker.iterate()
+                if counter % 10 == 0:
+                    nets_c.iterate()
+                counter -= 1
+            else:
+                command = input('enter thread to step [(t)racker, (n)eural, (g)ui], \n\tnumber of frames to process normally, or a command to eval (starting with >)')
+                if command.startswith('>'):
+                    eval(command[1:])
+                    continue
+                elif command == 't':
+                    p_tracker.iterate()
+                elif command == 'n':
+                    nets_c.iterate()
+                elif command.isnumeric():
+                    counter = int(command)
+
+
+        if not nets_c.is_activated:
+            rospy.signal_shutdown('ROSBag completed!')
+        # Wait for a new snapshot of the tracker, skipping it if nothing changed
+        if not main_sched.wait():
+            continue
+        snapshot = p_tracker.getSnapshot()
+        if snapshot.version == last_version:
+            continue
+        last_version = snapshot.version
+
+        # Move, draw and save
+        record(render(control({'frame': snapshot.frame, 'snapshot': snapshot})))
         # elapsed_ = time.time() - start
     # Finish the execution
     if benchmark:
-        benchmarker.makeDetectionStats(nets_c.total_times)
+        if use_pipeline:
+            benchmarker.makePipelineStats(runtime.stats())
+        benchmarker.makeDetectionStats(nets_c.total_times, nets_c.face_prep_times)
         benchmarker.makeTrackingStats(p_tracker.tracked_counter, frames_with_ref)
-        benchmarker.makeIters(frame_counter, nets_c.total_times, num_trackings, ref_errors, ref_coords, sent_responses)
+        benchmarker.makeFaceStats(nets_c.face_counts)
+        benchmarker.makeModelSwitches(nets_c.model_switches)
+        benchmarker.makeTrackerSettings(p_tracker.settings_changes)
+        benchmarker.makeSchedulingStats([p_tracker.scheduler, nets_c.scheduler, main_sched])
+        p_tracker.flushTrajectories()
+        benchmarker.makeTrajectories()
+        benchmarker.saveDetectionLog(p_tracker.detection_log)
+        benchmarker.makeIters(nets_c.total_times, num_trackings, ref_errors, ref_coords, sent_responses,
+                              nets_c.face_counts, nets_c.face_prep_times)
         benchmarker.writeBenchmark()
     rospy.signal_shutdown("Finished!!")
@@ -0,0 +1,204 @@
+#
+# Created on Oct. 2026
+# @author: naxvm
+#
+# Small dataflow runtime: the stages declared on the YML file are
+# connected through bounded queues, and each one runs on its own
+# worker threads, so the work can be rebalanced by configuration.
+
+import threading
+import time
+import traceback
+from collections import deque
+
+import numpy as np
+from cprint import cprint
+
+POLICIES = ['drop_oldest', 'block']
+GET_TIMEOUT = 0.1  # s, maximum blocking time of a worker (to check for the stop signal)
+LATENCY_WINDOW = 500  # processing times kept per stage for the statistics
+END = object()  # sentinel sent downstream by a finished stage, after its last packet
+
+
+class BoundedQueue:
+    """FIFO queue with a maximum size. When it is full, 'drop_oldest' discards the
+    oldest item to make room for the new one, while 'block' makes the producer wait
+    (propagating the backpressure upstream)."""
+
+    def __init__(self, maxsize=1, policy='drop_oldest'):
+        if policy not in POLICIES:
+            cprint.fatal(f'Unknown queue policy {policy} (choose among {POLICIES})', interrupt=True)
+        self.maxsize = maxsize
+        self.policy = policy
+        self.items = deque()
+        self.cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item, stop_event):
+        with self.cond:
+            if self.policy == 'block':
+                while len(self.items) >= self.maxsize and not stop_event.is_set():
+                    self.cond.wait(GET_TIMEOUT)
+            elif len(self.items) >= self.maxsize:
+                self.items.popleft()
+                self.dropped += 1
+            self.items.append(item)
+            self.cond.notify_all()
+
+    def get(self, timeout=GET_TIMEOUT):
+        """Return the oldest item, or None if the queue stayed empty."""
+        with self.cond:
+            if not self.items:
+                self.cond.wait(timeout)
+            if not self.items:
+                return None
+            item = self.items.popleft()
+            self.cond.notify_all()
+            return item
+
+
+class Stage:
+    """Node of the pipeline. Its function receives a packet (dict) and returns
+    the packet for the downstream stages, or None to stop its propagation.
+    A stage without input (source) is called with None until it raises StopIteration.
+    Then, every stage finishes its pending packets before passing the end downstream."""
+
+    def __init__(self, name, func, workers=1, queue_size=1, policy='drop_oldest', is_source=False):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.is_source = is_source
+        self.input = None if is_source else BoundedQueue(queue_size, policy)
+        self.outputs = []
+
+        # Statistics
+        self.processed = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.stats_lock = threading.Lock()
+        self.start_time = None
+        self.threads = []
+        self.ended = threading.Event()
+
+    def work(self, stop_event):
+        """Loop of each worker thread."""
+        while not stop_event.is_set() and not self.ended.is_set():
+            if self.is_source:
+                packet = None
+            else:
+                packet = self.input.get()
+                if packet is None:
+                    continue
+                if packet is END:
+                    self.finish(stop_event)
+                    break
+
+            start = time.monotonic()
+            try:
+                out = self.func(packet)
+            except StopIteration:
+                cprint.info(f'Pipeline source {self.name} exhausted.')
+                self.finish(stop_event)
+                break
+            except Exception:
+                # A dead worker would leave the pipeline waiting forever: stop it all
+                cprint.fatal(f'Pipeline stage {self.name} failed:\n{traceback.format_exc()}')
+                stop_event.set()
+                break
+            elapsed = time.monotonic() - start
+
+            with self.stats_lock:
+                self.processed += 1
+                self.latencies.append(elapsed)
+            if out is not None:
+                for queue in self.outputs:
+                    # Each downstream stage gets its own packet (they add their results to it)
+                    queue.put(dict(out), stop_event)
+
+    def finish(self, stop_event):
+        """End the stage: let the other workers complete their packets, and pass the end downstream."""
+        self.ended.set()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        for queue in self.outputs:
+            queue.put(END, stop_event)
+
+    def start(self, stop_event):
+        self.start_time = time.monotonic()
+        for idx in range(self.workers):
+            thread = threading.Thread(target=self.work, args=(stop_event,), name=f'{self.name}-{idx}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stats(self):
+        """Throughput and processing latency of the stage."""
+        with self.stats_lock:
+            latencies = 1000.0 * np.array(self.latencies)
+            processed = self.processed
+        elapsed = time.monotonic() - self.start_time if self.start_time is not None else 0
+        stats = {
+            '1.- Workers': self.workers,
+            '2.- Processed': processed,
+            '3.- Throughput': f'{processed / elapsed if elapsed > 0 else 0:.2f} items/s',
+            '4.- MedianLatency': f'{np.median(latencies) if len(latencies) else 0:.4f} ms',
+            '5.- P95Latency': f'{np.percentile(latencies, 95) if len(latencies) else 0:.4f} ms',
+        }
+        if self.input is not None:
+            stats['6.- Dropped'] = self.input.dropped
+        return stats
+
+
+class PipelineRuntime:
+    """Build and run a pipeline from its YML declaration: a list of stages with
+    Type (key on the provided functions), and optionally Name (Type by default),
+    Input (upstream stage), Workers, QueueSize and Policy. The types listed on
+    single_worker (functions which are not reentrant, or must keep the order
+    of the packets) can't have more than one worker."""
+
+    def __init__(self, stages_cfg, functions, single_worker=()):
+        self.stages = {}
+        self.stop_event = threading.Event()
+
+        for stage_cfg in stages_cfg:
+            stage_type = stage_cfg['Type']
+            name = stage_cfg.get('Name', stage_type)
+            if stage_type not in functions:
+                cprint.fatal(f'Pipeline stage {name}: unknown type {stage_type}', interrupt=True)
+            workers = stage_cfg.get('Workers', 1)
+            if workers < 1:
+                cprint.fatal(f'Pipeline stage {name}: it needs at least one worker', interrupt=True)
+            if workers > 1 and stage_type in single_worker:
+                cprint.fatal(f'Pipeline stage {name}: the {stage_type} stages must have a single worker',
+                             interrupt=True)
+            upstream = stage_cfg.get('Input')
+            stage = Stage(name, functions[stage_type],
+                          workers=workers,
+                          queue_size=stage_cfg.get('QueueSize', 1),
+                          policy=stage_cfg.get('Policy', 'drop_oldest'),
+                          is_source=upstream is None)
+            if upstream is not None:
+                if upstream not in self.stages:
+                    cprint.fatal(f'Pipeline stage {name}: the input {upstream} has to be declared before',
+                                 interrupt=True)
+                self.stages[upstream].outputs.append(stage.input)
+            self.stages[name] = stage
+
+    @property
+    def is_running(self):
+        """False when it was stopped, or when every stage finished (after the source was exhausted)."""
+        return not self.stop_event.is_set() and not all(stage.ended.is_set() for stage in self.stages.values())
+
+    def start(self):
+        # Downstream stages first, so no packet is lost on the startup
+        for stage in reversed(list(self.stages.values())):
+            stage.start(self.stop_event)
+
+    def stop(self):
+        self.stop_event.set()
+        for stage in self.stages.values():
+            for thread in stage.threads:
+                thread.join(timeout=1)
+
+    def stats(self):
+        """Statistics of every stage, for the benchmark report."""
+        return {name: stage.stats() for name, stage in self.stages.items()}
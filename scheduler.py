@@ -0,0 +1,133 @@
+#
+# Created on Oct. 2026
+# @author: naxvm
+#
+# Pacing of the application loops: each loop either runs at a target
+# period (monotonic deadlines, not accumulated sleeps) or whenever its
+# input source publishes something new, recording its timing behaviour.
+
+import threading
+import time
+
+import numpy as np
+
+# Upper edges (ms) of the jitter histogram bins
+JITTER_BINS = [0.5, 1, 2, 5, 10, 20, 50, 100, np.inf]
+INPUT_TIMEOUT = 0.1  # s, maximum blocking time waiting for new input (to check for shutdowns)
+
+
+class SequenceNotifier:
+    """Sequence number of a data source (camera frames, tracker snapshots...),
+    which the consumers can block on until something new is published."""
+
+    def __init__(self):
+        self.seq = 0
+        self.stamp = time.monotonic()
+        self.cond = threading.Condition()
+
+    def publish(self):
+        """Indicate that new data is available."""
+        with self.cond:
+            self.seq += 1
+            self.stamp = time.monotonic()
+            self.cond.notify_all()
+
+    def waitNewer(self, last_seq, timeout=None):
+        """Block until the sequence is newer than last_seq (or the timeout expires).
+        Return the current sequence number."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > last_seq, timeout)
+            return self.seq
+
+
+class RateScheduler:
+    """Pace a loop calling wait() at the beginning of each iteration. If a period is
+    given, the iterations are released at fixed deadlines; if a notifier is given,
+    only when there is new input (the period then acts as a maximum rate)."""
+
+    def __init__(self, name, period=None, notifier=None):
+        self.name = name
+        self.period = period
+        self.notifier = notifier
+
+        self.last_seq = 0
+        self.deadline = None
+        self.work_start = None
+
+        # Statistics
+        self.iterations = 0
+        self.deadline_misses = 0
+        self.overruns = 0
+        self.idle_waits = 0
+        self.jitter_sum = 0.0
+        self.jitter_max = 0.0
+        self.jitter_hist = np.zeros(len(JITTER_BINS), dtype=int)
+
+    def recordJitter(self, jitter):
+        """Store the delay (s) between the scheduled release and the actual one."""
+        jitter_ms = 1000.0 * max(jitter, 0.0)
+        self.jitter_sum += jitter_ms
+        self.jitter_max = max(self.jitter_max, jitter_ms)
+        self.jitter_hist[np.searchsorted(JITTER_BINS, jitter_ms)] += 1
+
+    def wait(self):
+        """Block until the next iteration has to run. Return False if there was
+        no new input before the timeout (the caller should not process anything)."""
+        now = time.monotonic()
+        if self.work_start is not None and self.period is not None and now - self.work_start > self.period:
+            # The previous iteration took longer than the period
+            self.overruns += 1
+
+        if self.period is not None:
+            if self.deadline is None:
+                self.deadline = now
+            else:
+                self.deadline += self.period
+            if now > self.deadline + self.period:
+                # A whole period late (a late start within the period only adds jitter).
+                # Skip the lost deadlines instead of trying to catch up.
+                self.deadline_misses += 1
+                self.deadline = now
+            else:
+                time.sleep(max(0.0, self.deadline - time.monotonic()))
+
+        released = self.deadline if self.period is not None else None
+        if self.notifier is not None:
+            seq = self.notifier.waitNewer(self.last_seq, timeout=INPUT_TIMEOUT)
+            if seq <= self.last_seq:
+                self.idle_waits += 1
+                self.work_start = None
+                # Nothing was released: the deadlines are anchored again on the next input,
+                # so the time waiting for it is not taken as lateness
+                self.deadline = None
+                return False
+            self.last_seq = seq
+            # Released when both the deadline arrived and the input was published
+            stamp = self.notifier.stamp
+            released = stamp if released is None else max(released, stamp)
+            if self.period is not None:
+                # The next deadline is one period after this release (the period is a maximum rate)
+                self.deadline = released
+
+        self.work_start = time.monotonic()
+        if released is not None:
+            self.recordJitter(self.work_start - released)
+        self.iterations += 1
+        return True
+
+    def stats(self):
+        """Summary of the timing behaviour, for the benchmark report."""
+        hist = {}
+        lower = 0
+        for upper, count in zip(JITTER_BINS, self.jitter_hist):
+            hist[f'{lower}-{upper} ms'] = int(count)
+            lower = upper
+        return {
+            '1.- Iterations': self.iterations,
+            '2.- DeadlineMisses': self.deadline_misses,
+            '3.- Overruns': self.overruns,
+            '4.- IdleWaits': self.idle_waits,
+            '5.- MeanJitter': f'{self.jitter_sum / max(self.iterations, 1):.4f} ms',
+            '6.- MaxJitter': f'{self.jitter_max:.4f} ms',
+            '7.- JitterHistogram': hist,
+        }
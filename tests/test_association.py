@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from Actuation.association import Associator, associate, centerDistances, iouMatrix
+
+
+def test_center_distances():
+    # Centers at (10, 10), (13, 14) and (10, 30)
+    boxes_a = [[0, 0, 20, 20]]
+    boxes_b = [[8, 9, 10, 10], [5, 25, 10, 10]]
+    np.testing.assert_allclose(centerDistances(boxes_a, boxes_b), [[5, 20]])
+
+
+def test_iou():
+    boxes = [[0, 0, 10, 10], [5, 0, 10, 10], [20, 20, 5, 5], [0, 0, 10, 10]]
+    iou = iouMatrix(boxes[:1], boxes)
+    # Identical, overlapping on half of each box (50 / 150), and disjoint
+    np.testing.assert_allclose(iou, [[1, 1 / 3, 0, 1]])
+
+
+def test_hungarian_is_globally_optimal():
+    # Greedy takes the cheapest pair (0, 0) first, and row 1 is left only with a gated column.
+    # The hungarian solver gives up that pair to match both rows
+    cost = np.array([[1.0, 2.0],
+                     [2.0, 100.0]])
+    assert associate(cost, 50.0, 'hungarian') == ([(0, 1), (1, 0)], [], [])
+    assert associate(cost, 50.0, 'greedy') == ([(0, 0)], [1], [1])
+
+
+@pytest.mark.parametrize('solver', ['hungarian', 'greedy'])
+def test_gate(solver):
+    # The gate is inclusive, and a gated pair is never taken even if it is the only option left
+    cost = np.array([[1.0, 9.0],
+                     [9.0, 9.0]])
+    assert associate(cost, 1.0, solver) == ([(0, 0)], [1], [1])
+    assert associate(np.full((3, 2), 5.0), 1.0, solver) == ([], [0, 1, 2], [0, 1])
+
+
+@pytest.mark.parametrize('solver', ['hungarian', 'greedy'])
+def test_more_detections_than_tracks(solver):
+    cost = np.array([[4.0], [1.0], [3.0]])
+    assert associate(cost, 10.0, solver) == ([(1, 0)], [0, 2], [])
+
+
+@pytest.mark.parametrize('solver', ['hungarian', 'greedy'])
+def test_empty(solver):
+    assert associate(np.zeros((0, 3)), 1.0, solver) == ([], [], [0, 1, 2])
+    assert associate(np.zeros((2, 0)), 1.0, solver) == ([], [0, 1], [])
+
+
+def test_center_gate_from_the_same_person_threshold():
+    # SamePersonThr was tuned on half the distance between the centers
+    associator = Associator(same_person_thr=20)
+    tracks = [[100, 100, 50, 100], [300, 100, 50, 100]]
+    detections = [[139, 100, 50, 100, 0.9], [341, 100, 50, 100, 0.9]]
+    assert associator.match(detections, tracks) == ([(0, 0)], [1], [1])
+
+
+def test_iou_metric():
+    associator = Associator(same_person_thr=20, association_cfg={'Metric': 'iou', 'MinIoU': 0.5})
+    tracks = [[0, 0, 100, 100], [200, 0, 100, 100]]
+    # IoU of 0.6 with the first track, and of 1/3 with the second one
+    detections = [[0, 0, 100, 60], [250, 0, 100, 100]]
+    assert associator.match(detections, tracks) == ([(0, 0)], [1], [1])
+
+
+@pytest.mark.parametrize('association_cfg', [{'Solver': 'hungrian'}, {'Metric': 'giou'}])
+def test_rejects_unknown_settings(association_cfg):
+    # On the construction, instead of on the first detection
+    with pytest.raises(SystemExit):
+        Associator(same_person_thr=20, association_cfg=association_cfg)
@@ -0,0 +1,74 @@
+import numpy as np
+
+from Actuation.motion_estimators import BoxesMotion, MotionEstimator
+from Actuation.people_tracker import PeopleTracker
+
+IM_SIZE = (640, 480)
+BOX_SIZE = np.array([80, 200], dtype=np.float32)
+
+
+class BiasedFlow(MotionEstimator):
+    """Reports the same displacement for every track, whatever they actually do."""
+
+    def __init__(self, displ):
+        super(BiasedFlow, self).__init__()
+        self.displ = np.asarray(displ, dtype=np.float64)
+
+    def step(self, gray, boxes, track_ids):
+        return BoxesMotion(boxes, np.tile(self.displ, (len(boxes), 1)), np.ones(len(boxes), dtype=bool))
+
+
+def makeTracker(displ):
+    tracker = PeopleTracker(patience=10, ref_sim_thr=0.8, same_person_thr=60, debug=True)
+    tracker.image = np.zeros((IM_SIZE[1], IM_SIZE[0], 3), dtype=np.uint8)
+    tracker.im_size = tracker.tracks.im_size = IM_SIZE
+    tracker.motion_estimator = BiasedFlow(displ)
+    return tracker
+
+
+def detection(center):
+    return list(np.concatenate((center - BOX_SIZE / 2, BOX_SIZE))) + [0.9]
+
+
+def trackerCenter(tracker):
+    box = tracker.tracks.boxes[tracker.tracks.slots()[0]]
+    return box[:2] + box[2:] / 2
+
+
+def test_boxes_follow_the_detections_despite_a_biased_flow():
+    # The person walks 5 px/frame, but the keypoints only see 2 px/frame. Detected every 3 frames
+    tracker = makeTracker([2, 0])
+    true_center = np.array([150, 240], dtype=np.float32)
+    tracker._updateWithDetections([detection(true_center)], [], [])
+    for frame in range(1, 61):
+        true_center = true_center + [5, 0]
+        tracker.stepAll()
+        if frame % 3 == 0:
+            tracker._updateWithDetections([detection(true_center)], [], [])
+            # Right after each detection, the box is on it (and still the same track)
+            assert len(tracker.tracks.slots()) == 1
+            np.testing.assert_allclose(trackerCenter(tracker), true_center, atol=1e-3)
+        else:
+            # In between, it only lags by the bias accumulated since the latest detection
+            assert abs(trackerCenter(tracker)[0] - true_center[0]) <= 3 * (frame % 3) + 1e-3
+
+
+def test_positions_stay_uncertain_between_detections():
+    # The keypoint displacements are relative: they can't make the position more certain than a detection
+    tracker = makeTracker([3, -1])
+    tracker._updateWithDetections([detection(np.array([300, 240], dtype=np.float32))], [], [])
+    slot = tracker.tracks.slots()[0]
+    variances = []
+    for _ in range(10):
+        tracker.stepAll()
+        variances.append(tracker.tracks.covs[slot, 0, 0])
+    assert np.all(np.diff(variances) > 0)
+    # And the velocity converges to the measured displacement
+    np.testing.assert_allclose(tracker.tracks.states[slot, 2:], [3, -1], atol=0.2)
+
+
+def test_budget_only_with_configurable_estimators():
+    for estimator, has_budget in [('lk', True), ('dis', False), ('mosse', False)]:
+        tracker = PeopleTracker(patience=10, ref_sim_thr=0.8, same_person_thr=60, motion_cfg={'Estimator': estimator},
+                                budget_cfg={}, debug=True)
+        assert (tracker.budget_controller is not None) == has_budget
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import PipelineRuntime
+
+N_PACKETS = 200
+
+
+def makeSource():
+    counter = iter(range(N_PACKETS))
+
+    def source(_):
+        return {'idx': next(counter)}
+    return source
+
+
+def slow(packet):
+    time.sleep(0.001)
+    return packet
+
+
+def runToEnd(runtime, timeout=10.0):
+    runtime.start()
+    deadline = time.monotonic() + timeout
+    while runtime.is_running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not runtime.is_running
+    runtime.stop()
+
+
+def test_packets_in_flight_are_drained():
+    received = []
+    lock = threading.Lock()
+
+    def sink(packet):
+        with lock:
+            received.append(packet['idx'])
+        return packet
+
+    stages_cfg = [{'Type': 'source'},
+                  {'Type': 'slow', 'Input': 'source', 'Workers': 3, 'QueueSize': 4, 'Policy': 'block'},
+                  {'Type': 'sink', 'Input': 'slow', 'Policy': 'block'}]
+    runtime = PipelineRuntime(stages_cfg, {'source': makeSource(), 'slow': slow, 'sink': sink},
+                              single_worker=('source', 'sink'))
+    runToEnd(runtime)
+    assert sorted(received) == list(range(N_PACKETS))
+
+
+def test_single_worker_keeps_the_order():
+    received = []
+    stages_cfg = [{'Type': 'source'},
+                  {'Type': 'sink', 'Input': 'source', 'QueueSize': 8, 'Policy': 'block'}]
+    runtime = PipelineRuntime(stages_cfg, {'source': makeSource(), 'sink': lambda p: received.append(p['idx'])},
+                              single_worker=('source', 'sink'))
+    runToEnd(runtime)
+    assert received == list(range(N_PACKETS))
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_rejects_workers(workers):
+    stages_cfg = [{'Type': 'source'},
+                  {'Type': 'sink', 'Input': 'source', 'Workers': workers}]
+    with pytest.raises(SystemExit):
+        PipelineRuntime(stages_cfg, {'source': makeSource(), 'sink': slow}, single_worker=('sink',))
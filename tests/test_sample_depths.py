@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from utils import computeXError, sampleDepths
+
+IM_SHAPE = (480, 640)
+BOXES = [[100, 50, 120, 300], [400, 120, 90, 200], [10, 300, 61, 41]]
+
+
+def baselineXError(coords, depth):
+    """computeXError before sampleDepths replaced it (only np.int, removed from numpy, changed)."""
+    coords = np.array(coords, dtype=int)
+    bb_depth = depth[coords[1]:coords[1]+coords[3], coords[0]:coords[0]+coords[2]]
+    ph, pw = bb_depth.shape
+    cropped_depth = bb_depth[ph//10:-ph//10, pw//10:-pw//10]
+    vg = np.linspace(0, cropped_depth.shape[0]-1, num=10, dtype=int)
+    hg = np.linspace(0, cropped_depth.shape[1]-1, num=10, dtype=int)
+    grid = np.meshgrid(vg, hg)
+    sampled_depths = cropped_depth[tuple(grid)].ravel()
+    median = np.nanmedian(sampled_depths)
+    if np.isnan(median):
+        return 0.0
+    return median
+
+
+def gradientDepth():
+    # Farther towards the top of the image (the floor recedes)
+    rows = np.arange(IM_SHAPE[0], dtype=np.float32)[:, None]
+    return np.broadcast_to(6.0 - rows / 100, IM_SHAPE).astype(np.float32)
+
+
+def personDepth():
+    # Persons at 1.5, 2.5 and 4 m (filling their boxes but the 10% borders) over a 6 m background
+    depth = np.full(IM_SHAPE, 6.0, dtype=np.float32)
+    for (x, y, w, h), dist in zip(BOXES, [1.5, 2.5, 4.0]):
+        depth[y + h // 10:y + h - h // 10, x + w // 10:x + w - w // 10] = dist
+    return depth
+
+
+def holedDepth():
+    # Persons with a regular pattern of missing readings (nan)
+    depth = personDepth()
+    depth[::3, ::2] = np.nan
+    return depth
+
+
+@pytest.mark.parametrize('depth', [personDepth(), gradientDepth(), holedDepth()],
+                         ids=['persons', 'gradient', 'holes'])
+def test_same_as_baseline(depth):
+    expected = [baselineXError(box, depth) for box in BOXES]
+    # The sampling grids differ in less than a pixel
+    np.testing.assert_allclose(sampleDepths(BOXES, depth), expected, atol=0.02)
+    np.testing.assert_allclose([computeXError(box, depth) for box in BOXES], expected, atol=0.02)
+
+
+def test_background_out_of_the_padding():
+    np.testing.assert_array_equal(sampleDepths(BOXES, personDepth()), [1.5, 2.5, 4.0])
+
+
+def test_zeros_are_missing_readings():
+    depth = personDepth()
+    x, y, w, h = BOXES[0]
+    depth[y:y + h // 2, x:x + w] = 0
+    # The baseline took them as distances, so its median fell between them and the person
+    assert baselineXError(BOXES[0], depth) < 1.5
+    assert sampleDepths(BOXES[:1], depth)[0] == 1.5
+
+
+def test_all_zero_depth():
+    depth = np.zeros(IM_SHAPE, dtype=np.float32)
+    assert np.isnan(sampleDepths(BOXES, depth)).all()
+    # Reported as 0 m, as the baseline did
+    assert [computeXError(box, depth) for box in BOXES] == [baselineXError(box, depth) for box in BOXES] == [0.0] * 3
+
+
+def test_trimmed_mean_discards_outliers():
+    depth = personDepth()
+    x, y, w, h = BOXES[1]
+    # Specular spikes on a few rows of the person (a tenth of the samples)
+    depth[y + h // 2:y + h // 2 + 3, x:x + w] = 9.0
+    assert sampleDepths(BOXES[1:2], depth, stat='trimmed')[0] == pytest.approx(2.5)
+    # Without trimming, they pull the mean up
+    assert sampleDepths(BOXES[1:2], depth, stat='trimmed', trim=0.0)[0] > 3.0
+
+
+def test_boxes_out_of_the_image():
+    depth = personDepth()
+    # Clipped to the image: partly outside keeps the visible part, fully outside is unknown
+    result = sampleDepths([[-50, -50, 100, 100], [700, 100, 50, 50], [0, 0, 0, 0], [-20, 0, 10, 480]], depth)
+    assert result[0] == 6.0
+    assert np.isnan(result[1:]).all()
+    assert sampleDepths(np.zeros((0, 4)), depth).shape == (0,)
@@ -0,0 +1,60 @@
+import numpy as np
+
+from Actuation.spatial_index import KeypointGrid
+
+IM_SIZE = (640, 480)
+
+
+def pairs(box_idx, point_idx):
+    return sorted(zip(box_idx.tolist(), point_idx.tolist()))
+
+
+def test_cells():
+    # 32 px cells: 20 x 15 of them, with the points sorted by cell
+    points = [[100, 10], [5, 5], [40, 5], [5, 40], [639, 479]]
+    grid = KeypointGrid(points, IM_SIZE)
+    assert (grid.n_cols, grid.n_rows) == (20, 15)
+    cols, rows = grid.cellOf(grid.points[:, 0], grid.points[:, 1])
+    assert cols.tolist() == [3, 0, 1, 0, 19] and rows.tolist() == [0, 0, 0, 1, 14]
+    assert grid.order.tolist() == [1, 2, 0, 3, 4]
+    # Cells (0, 0) and (1, 0) hold one point each
+    assert grid.starts[:3].tolist() == [0, 1, 2]
+
+
+def test_box_over_several_cells():
+    points = [[10, 10], [50, 10], [90, 70], [150, 70], [50, 200]]
+    grid = KeypointGrid(points, IM_SIZE)
+    assert sorted(grid.query([0, 0, 100, 100]).tolist()) == [0, 1, 2]
+
+
+def test_borders_are_inclusive():
+    # On the corners of the box, which are also on the borders of the cells
+    points = [[32, 32], [64, 64], [64, 32], [65, 64], [31.5, 32]]
+    grid = KeypointGrid(points, IM_SIZE)
+    assert sorted(grid.query([32, 32, 32, 32]).tolist()) == [0, 1, 2]
+
+
+def test_overlapping_boxes():
+    points = [[10, 10], [25, 25], [40, 40]]
+    grid = KeypointGrid(points, IM_SIZE)
+    box_idx, point_idx = grid.queryBoxes([[0, 0, 30, 30], [20, 20, 30, 30], [200, 200, 10, 10]])
+    assert pairs(box_idx, point_idx) == [(0, 0), (0, 1), (1, 1), (1, 2)]
+    assert grid.counts([[0, 0, 30, 30], [20, 20, 30, 30], [200, 200, 10, 10]]).tolist() == [2, 2, 0]
+
+
+def test_out_of_the_image():
+    # Points out of the image are kept on the border cells, and still tested exactly
+    points = [[-5, -5], [700, 100], [5, 5]]
+    grid = KeypointGrid(points, IM_SIZE)
+    assert sorted(grid.query([-10, -10, 20, 20]).tolist()) == [0, 2]
+    assert grid.query([600, 90, 200, 20]).tolist() == [1]
+    assert len(grid.query([1000, 1000, 50, 50])) == 0
+    assert grid.counts([[-100, -100, 2000, 2000]]).tolist() == [3]
+
+
+def test_empty():
+    grid = KeypointGrid(np.zeros((0, 2)), IM_SIZE)
+    assert len(grid.query([0, 0, 640, 480])) == 0
+    grid = KeypointGrid([[5, 5]], IM_SIZE)
+    box_idx, point_idx = grid.queryBoxes(np.zeros((0, 4)))
+    assert len(box_idx) == len(point_idx) == 0
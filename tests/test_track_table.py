@@ -0,0 +1,42 @@
+import numpy as np
+
+from Actuation.track_table import HISTORY_LEN, TrackTable
+
+
+class HistoryLog:
+    def __init__(self):
+        self.records = {}
+
+    def __call__(self, track_id, frames, stamps, boxes, sims):
+        assert len(frames) == len(stamps) == len(boxes) == len(sims) > 0
+        self.records.setdefault(track_id, []).extend(frames.tolist())
+
+
+def test_whole_trajectories_are_logged():
+    log = HistoryLog()
+    tracks = TrackTable(history_log=log)
+    person = tracks.add([10, 10, 50, 100])
+    candidate = tracks.add([300, 10, 50, 100])
+    n_frames = 3 * HISTORY_LEN + 7
+    for frame in range(1, n_frames + 1):
+        if frame == 5:
+            tracks.confirmed[person] = True
+        tracks.boxes[person, 0] += 1
+        tracks.record(frame, 0.1 * frame)
+    # Every record is logged once and in order, before the ring buffer wraps
+    assert log.records[int(tracks.ids[person])] == list(range(1, 3 * HISTORY_LEN + 1))
+    tracks.remove(np.array([person, candidate]))
+    assert log.records[int(tracks.ids[person])] == list(range(1, n_frames + 1))
+    # The candidates that were never confirmed are dropped
+    assert int(tracks.ids[candidate]) not in log.records
+
+
+def test_without_log():
+    tracks = TrackTable()
+    slot = tracks.add([10, 10, 50, 100])
+    tracks.confirmed[slot] = True
+    for frame in range(1, 2 * HISTORY_LEN):
+        tracks.record(frame, 0.0)
+    tracks.remove([slot])
+    track_id, frames, _, _, _ = tracks.history(slot)
+    assert frames.tolist() == list(range(HISTORY_LEN, 2 * HISTORY_LEN))
@@ -0,0 +1,70 @@
+import numpy as np
+
+from Actuation.spatial_index import KeypointGrid
+from Actuation.tracking_classes import tracksMotion
+
+
+def square(center, half_side):
+    """Corners of a square of keypoints, and its center."""
+    offsets = np.array([[-1, -1], [1, -1], [-1, 1], [1, 1], [0, 0]], dtype=np.float64)
+    return np.asarray(center, dtype=np.float64) + half_side * offsets
+
+
+def test_translation():
+    old_kps = square([50, 50], 10)
+    displs, ratios, valid = tracksMotion([[30, 30, 40, 40]], old_kps, old_kps + [3, -2])
+    assert valid.tolist() == [True]
+    np.testing.assert_allclose(displs, [[3, -2]])
+    np.testing.assert_allclose(ratios, [[1, 1]])
+
+
+def test_scaling():
+    # The person gets closer: its keypoints spread 1.5 times around a center that moves right
+    old_kps = square([50, 50], 10)
+    new_kps = square([54, 50], 15)
+    displs, ratios, valid = tracksMotion([[30, 30, 40, 40]], old_kps, new_kps)
+    np.testing.assert_allclose(displs, [[4, 0]])
+    np.testing.assert_allclose(ratios, [[1.5, 1.5]])
+
+
+def test_degenerate_spread():
+    # Aligned keypoints (no vertical spread) move the box, but can't rescale it
+    old_kps = np.array([[40, 50], [50, 50], [60, 50]], dtype=np.float64)
+    displs, ratios, valid = tracksMotion([[30, 30, 40, 40]], old_kps, old_kps + [1, 1])
+    assert valid.tolist() == [True]
+    np.testing.assert_allclose(displs, [[1, 1]])
+    assert np.isnan(ratios).all()
+
+
+def test_independent_boxes():
+    # Two persons moving apart, a box without keypoints, and a keypoint on the border of the first box
+    old_kps = np.vstack((square([50, 50], 10), square([150, 50], 10), [[70, 70]]))
+    new_kps = old_kps + np.repeat([[-5, 0], [5, 0], [-5, 0]], [5, 5, 1], axis=0)
+    boxes = [[30, 30, 40, 40], [130, 30, 40, 40], [300, 300, 20, 20]]
+    displs, ratios, valid = tracksMotion(boxes, old_kps, new_kps)
+    assert valid.tolist() == [True, True, False]
+    np.testing.assert_allclose(displs, [[-5, 0], [5, 0], [0, 0]])
+    assert np.isnan(ratios[2]).all()
+
+
+def test_overlapping_boxes_share_keypoints():
+    # A keypoint inside both boxes counts for both of them
+    old_kps = np.array([[10, 10], [20, 20], [30, 30]], dtype=np.float64)
+    new_kps = old_kps + [[0, 0], [6, 6], [0, 0]]
+    displs, _, _ = tracksMotion([[0, 0, 20, 20], [20, 20, 20, 20]], old_kps, new_kps)
+    np.testing.assert_allclose(displs, [[3, 3], [3, 3]])
+
+
+def test_memberships_from_the_grid():
+    old_kps = np.vstack((square([50, 50], 10), square([150, 50], 10))).astype(np.float32)
+    new_kps = old_kps * 1.1
+    boxes = [[30, 30, 40, 40], [130, 30, 40, 40]]
+    members = KeypointGrid(old_kps, (640, 480)).queryBoxes(boxes)
+    for computed, given in zip(tracksMotion(boxes, old_kps, new_kps), tracksMotion(boxes, old_kps, new_kps, members)):
+        np.testing.assert_allclose(computed, given)
+
+
+def test_no_keypoints():
+    displs, ratios, valid = tracksMotion([[30, 30, 40, 40]], np.zeros((0, 2)), np.zeros((0, 2)))
+    assert valid.tolist() == [False]
+    np.testing.assert_array_equal(displs, [[0, 0]])
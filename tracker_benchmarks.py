@@ -0,0 +1,174 @@
+#
+# Created on Oct. 2026
+# @author: naxvm
+#
+# Offline benchmarks of the tracking building blocks, run over the frames
+# of a ROSBag, and dumped into a YML file.
+
+import argparse
+import time
+from os import path
+
+import cv2
+import numpy as np
+import yaml
+from cprint import cprint
+
+from Actuation.keypoints import KeypointManager, PYRAMIDS_SUPPORTED
+from Actuation.motion_estimators import ESTIMATORS, FEATURE_PARAMS, LK_PARAMS
+from Actuation.tracking_classes import moveBox
+from Perception.Camera.ROSCam import ROSCam
+
+TOPICS = {'RGB':   '/camera/rgb/image_raw',
+          'Depth': '/camera/depth_registered/image_raw'}
+DRIFT_WINDOW = 30  # frames tracked forward (and then backward) to measure the drift
+
+
+def loadFrames(rosbag_file, max_frames=None):
+    """Read the grayscale frames of the ROSBag into memory."""
+    cam = ROSCam(TOPICS, rosbag_file)
+    frames = []
+    while max_frames is None or len(frames) < max_frames:
+        try:
+            image, _ = cam.getImages()
+        except StopIteration:
+            break
+        frames.append(cv2.cvtColor(image, cv2.COLOR_RGB2GRAY))
+    cprint.ok(f'{len(frames)} frames loaded from {rosbag_file}')
+    return frames
+
+
+def statsMs(times):
+    times = 1000.0 * np.array(times)
+    return {
+        '1.- Median': f'{np.median(times):.4f} ms',
+        '2.- P95': f'{np.percentile(times, 95):.4f} ms',
+    }
+
+
+def benchmarkPyramid(frames):
+    """Forward-backward LK per frame, rebuilding the pyramids on every call
+    (images) vs. building each frame's pyramid once and caching it."""
+    manager = KeypointManager(FEATURE_PARAMS, LK_PARAMS)
+    keypoints = [manager.detect(gray) for gray in frames[:-1]]
+
+    rebuild_times = []
+    for prev_gray, gray, kps in zip(frames[:-1], frames[1:], keypoints):
+        start = time.perf_counter()
+        manager.track(prev_gray, gray, kps)
+        rebuild_times.append(time.perf_counter() - start)
+
+    results = {
+        '1.- LKParams': {
+            '1.- WinSize': list(LK_PARAMS['winSize']),
+            '2.- MaxLevel': LK_PARAMS['maxLevel'],
+        },
+        '2.- Frames': len(rebuild_times),
+        '3.- PyramidsSupported': PYRAMIDS_SUPPORTED,
+        '4.- RebuiltPyramids': statsMs(rebuild_times),
+    }
+    if not PYRAMIDS_SUPPORTED:
+        cprint.warn('This OpenCV build does not accept prebuilt pyramids on calcOpticalFlowPyrLK')
+        return results
+
+    cached_times = []
+    prev_pyr = manager.buildPyramid(frames[0])
+    for gray, kps in zip(frames[1:], keypoints):
+        start = time.perf_counter()
+        pyr = manager.buildPyramid(gray)
+        manager.track(prev_pyr, pyr, kps)
+        cached_times.append(time.perf_counter() - start)
+        prev_pyr = pyr
+
+    saved = 1000.0 * (np.median(rebuild_times) - np.median(cached_times))
+    results['5.- CachedPyramids'] = statsMs(cached_times)
+    results['6.- SavedPerFrame'] = f'{saved:.4f} ms'
+    return results
+
+
+def initialBoxes(im_size):
+    """Person-like [x, y, w, h] boxes spread over the image, to be tracked by the estimators."""
+    im_w, im_h = im_size
+    w, h = im_w / 6, im_h / 2
+    return np.array([[x - w / 2, (im_h - h) / 2, w, h] for x in np.linspace(im_w / 4, 3 * im_w / 4, 3)],
+                    dtype=np.float32)
+
+
+def propagate(estimator, frames, boxes):
+    """Track the boxes over the frames with a motion estimator. Return
+    the final boxes and the processing time of each step."""
+    im_size = (frames[0].shape[1], frames[0].shape[0])
+    boxes = boxes.copy()
+    track_ids = np.arange(len(boxes))
+    estimator.setPrior(frames[0])
+    times = []
+    for gray in frames[1:]:
+        start = time.perf_counter()
+        avg_displs, std_ratios, valid, _ = estimator.step(gray, boxes, track_ids).boxesMotion(boxes)
+        for idx in np.flatnonzero(valid):
+            std_ratio = None if np.isnan(std_ratios[idx, 0]) else std_ratios[idx]
+            moveBox(boxes[idx], avg_displs[idx], std_ratio, im_size)
+        estimator.replenish(boxes)
+        times.append(time.perf_counter() - start)
+    return boxes, times
+
+
+def benchmarkEstimators(frames):
+    """Cost per frame of each motion estimator, and its drift: the boxes are tracked
+    forward and then backward over windows of frames, and the distance between their
+    initial and final centers (relative to their heights) is measured."""
+    im_size = (frames[0].shape[1], frames[0].shape[0])
+    initial = initialBoxes(im_size)
+    window = min(DRIFT_WINDOW, len(frames) - 1)
+    starts = range(0, len(frames) - window, window)
+
+    results = {
+        '1.- Frames': len(frames),
+        '2.- DriftWindow': window,
+    }
+    for est_idx, name in enumerate(ESTIMATORS, start=3):
+        times, drifts = [], []
+        for start in starts:
+            clip = frames[start:start + window + 1]
+            forward, forward_times = propagate(ESTIMATORS[name](), clip, initial)
+            backward, backward_times = propagate(ESTIMATORS[name](), clip[::-1], forward)
+            times += forward_times + backward_times
+            centers = initial[:, :2] + initial[:, 2:] / 2
+            drifts += list(np.linalg.norm(backward[:, :2] + backward[:, 2:] / 2 - centers, axis=1) / initial[:, 3])
+        results[f'{est_idx}.- {name}'] = {
+            '1.- TimePerFrame': statsMs(times),
+            '2.- MedianDrift': f'{np.median(drifts):.4f}',
+            '3.- MaxDrift': f'{np.max(drifts):.4f}',
+        }
+        cprint.info(f'{name}: {1000.0 * np.median(times):.2f} ms/frame, {np.median(drifts):.4f} median drift')
+    return results
+
+
+BENCHMARKS = {
+    'pyramid': benchmarkPyramid,
+    'estimators': benchmarkEstimators,
+}
+
+
+if __name__ == '__main__':
+    description = ''' Run a benchmark of the tracking components over the frames of a ROSBag,
+    and store the results into a YML file. '''
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('benchmark', type=str, choices=list(BENCHMARKS), help='Benchmark to run')
+    parser.add_argument('rosbag_file', type=str, help='ROSBag to perform the test on')
+    parser.add_argument('save_in', type=str, help='File in which write the output result')
+    parser.add_argument('--max_frames', type=int, default=None, help='Maximum number of frames to use')
+    args = parser.parse_args()
+
+    if not path.isfile(args.rosbag_file):
+        cprint.fatal(f'Error: the provided ROSBag {args.rosbag_file} does not exist', interrupt=True)
+
+    frames = loadFrames(args.rosbag_file, args.max_frames)
+    if len(frames) < 2:
+        cprint.fatal('Error: at least 2 frames are required', interrupt=True)
+
+    results = BENCHMARKS[args.benchmark](frames)
+    with open(args.save_in, 'w') as f:
+        yaml.dump({args.benchmark: results}, f)
+    cprint.ok(f'Benchmark written in {args.save_in}!')
@@ -0,0 +1,75 @@
+#
+# Created on Oct. 2026
+# @author: naxvm
+#
+# Replay the tracker offline over a recorded ROSBag and the detections logged
+# on a benchmark of that same bag (detections.pkl), to evaluate tracker
+# changes or parameters without running the neural networks.
+
+import argparse
+from os import path
+
+import numpy as np
+import yaml
+from cprint import cprint
+
+from Actuation.replay import TrackerReplay, loadDetectionLog
+from Perception.Camera.ROSCam import ROSCam
+
+
+def loadBag(rosbag_file, topics, max_frames=None, with_depth=False):
+    """Read the RGB frames of a ROSBag into a (N, H, W, 3) array
+    (and the depth ones into a (N, H, W) float32 array, if required)."""
+    cam = ROSCam(topics, rosbag_file)
+    n_frames = cam.getBagLength(topics)
+    if max_frames is not None:
+        n_frames = min(n_frames, max_frames)
+    images, depths = None, None
+    for idx in range(n_frames):
+        try:
+            image, depth = cam.getImages()
+        except StopIteration:
+            n_frames = idx
+            break
+        if images is None:
+            images = np.zeros((n_frames,) + image.shape, dtype=np.uint8)
+            if with_depth:
+                depths = np.zeros((n_frames,) + depth.shape[:2], dtype=np.float32)
+        images[idx] = image
+        if with_depth:
+            depths[idx] = depth[..., 0] if depth.ndim == 3 else depth
+    cprint.ok(f'{n_frames} frames loaded from {rosbag_file}')
+    if with_depth:
+        return images[:n_frames], depths[:n_frames]
+    return images[:n_frames]
+
+
+if __name__ == '__main__':
+    description = ''' Replay the tracker over a ROSBag, applying the detections logged
+    on a previous benchmark of it, and print (or save) the tracking metrics. '''
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('config_file', type=str, help='YML configuration (PeopleTracker, Topics and RosbagFile nodes)')
+    parser.add_argument('detection_log', type=str, help='detections.pkl file of a benchmark on the same ROSBag')
+    parser.add_argument('--rosbag_file', type=str, default=None, help='ROSBag (RosbagFile on the YML by default)')
+    parser.add_argument('--max_frames', type=int, default=None, help='Maximum number of frames to replay')
+    parser.add_argument('--save_in', type=str, default=None, help='YML file to write the metrics on')
+    args = parser.parse_args()
+
+    with open(args.config_file, 'r') as f:
+        cfg = yaml.safe_load(f)
+    rosbag_file = args.rosbag_file or cfg['RosbagFile']
+    for filename in [rosbag_file, args.detection_log]:
+        if not path.isfile(filename):
+            cprint.fatal(f'Error: the file {filename} does not exist', interrupt=True)
+
+    images = loadBag(rosbag_file, cfg['Topics'], args.max_frames)
+    replay = TrackerReplay(images, loadDetectionLog(args.detection_log), cfg['PeopleTracker'])
+    _, _, _, metrics = replay.run()
+
+    for key, value in metrics.items():
+        cprint.info(f'{key}: {value}')
+    if args.save_in is not None:
+        with open(args.save_in, 'w') as f:
+            yaml.dump(metrics, f)
+        cprint.ok(f'Metrics written in {args.save_in}!')
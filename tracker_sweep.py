@@ -0,0 +1,129 @@
+#
+# Created on Oct. 2026
+# @author: naxvm
+#
+# Sweep a grid of tracker and PID parameters over a recorded session: each
+# configuration is replayed offline (see tracker_replay.py) on a process
+# pool, reading the frames from a shared read-only memory-mapped file, and
+# the metrics of all of them are gathered on a comparison table.
+
+import argparse
+import copy
+import itertools
+import multiprocessing as mp
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from os import path
+
+import cv2
+import numpy as np
+import yaml
+from cprint import cprint
+
+from Actuation.replay import TrackerReplay, loadDetectionLog, replayControl
+from tracker_replay import loadBag
+
+SWEEP_SECTIONS = ['PeopleTracker', 'XController', 'WController']
+# Columns of the comparison table (in order)
+TABLE_COLUMNS = ['FramesWithRef', 'IdSwitches', 'TrackedPersons', 'MedianFrameCost',
+                 'WMeanResponse', 'WResponseJerk', 'XMeanResponse', 'XResponseJerk']
+
+# Data shared by the worker processes (loaded once per worker)
+_images = None
+_depths = None
+_detection_log = None
+
+
+def _initWorker(images_file, depths_file, log_file):
+    global _images, _depths, _detection_log
+    # One worker per core: avoid OpenCV spawning its own threads on each one
+    cv2.setNumThreads(1)
+    _images = np.load(images_file, mmap_mode='r')
+    _depths = np.load(depths_file, mmap_mode='r')
+    _detection_log = loadDetectionLog(log_file)
+
+
+def _runConfig(cfg):
+    """Replay a configuration on a worker, and return its metrics."""
+    replay = TrackerReplay(_images, _detection_log, cfg['PeopleTracker'])
+    _, ref_boxes, _, metrics = replay.run()
+    metrics.update(replayControl(ref_boxes, _depths, cfg['XController'], cfg['WController'], _images.shape[2]))
+    return metrics
+
+
+def expandGrid(base_cfg, grid):
+    """Build a configuration for each combination of the grid values.
+    Return the list of (changed parameters, configuration)."""
+    keys = [(section, param) for section in SWEEP_SECTIONS for param in grid.get(section, {})]
+    values = [grid[section][param] for section, param in keys]
+    configs = []
+    for combination in itertools.product(*values):
+        cfg = copy.deepcopy(base_cfg)
+        for (section, param), value in zip(keys, combination):
+            cfg[section][param] = value
+        configs.append(({f'{section}.{param}': value for (section, param), value in zip(keys, combination)}, cfg))
+    return configs
+
+
+def printTable(rows):
+    """Print the comparison table on the terminal."""
+    headers = list(rows[0].keys())
+    cells = [[f'{row[h]:.3f}' if isinstance(row[h], float) else str(row[h]) for h in headers] for row in rows]
+    widths = [max(len(h), *(len(c[idx]) for c in cells)) for idx, h in enumerate(headers)]
+    print('  '.join(h.ljust(w) for h, w in zip(headers, widths)))
+    for c in cells:
+        print('  '.join(v.ljust(w) for v, w in zip(c, widths)))
+
+
+if __name__ == '__main__':
+    description = ''' Replay a recorded session with every combination of a grid of PeopleTracker,
+    XController and WController parameters, in parallel, and write a comparison table. '''
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('sweep_file', type=str, help='''YML with the BaseConfig (followperson YML), the DetectionLog
+                        (detections.pkl of a benchmark), the Grid of values (per section and parameter), and
+                        optionally the RosbagFile, Workers, MaxFrames and SaveIn (YML table)''')
+    args = parser.parse_args()
+
+    with open(args.sweep_file, 'r') as f:
+        sweep = yaml.safe_load(f)
+    with open(sweep['BaseConfig'], 'r') as f:
+        base_cfg = yaml.safe_load(f)
+    rosbag_file = sweep.get('RosbagFile', base_cfg['RosbagFile'])
+    for filename in [rosbag_file, sweep['DetectionLog']]:
+        if not path.isfile(filename):
+            cprint.fatal(f'Error: the file {filename} does not exist', interrupt=True)
+
+    configs = expandGrid(base_cfg, sweep['Grid'])
+    cprint.info(f'{len(configs)} configurations to replay')
+
+    # Dump the frames once, to be memory-mapped (read-only) by every worker
+    tmp_dir = tempfile.mkdtemp(prefix='tracker_sweep_')
+    try:
+        images, depths = loadBag(rosbag_file, base_cfg['Topics'], sweep.get('MaxFrames'), with_depth=True)
+        images_file, depths_file = path.join(tmp_dir, 'images.npy'), path.join(tmp_dir, 'depths.npy')
+        np.save(images_file, images)
+        np.save(depths_file, depths)
+        del images, depths
+
+        workers = sweep.get('Workers', mp.cpu_count())
+        with ProcessPoolExecutor(workers, mp_context=mp.get_context('spawn'), initializer=_initWorker,
+                                 initargs=(images_file, depths_file, sweep['DetectionLog'])) as pool:
+            results = list(pool.map(_runConfig, [cfg for _, cfg in configs]))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    rows = []
+    for (params, _), metrics in zip(configs, results):
+        row = dict(params)
+        row.update({column: metrics[column] for column in TABLE_COLUMNS})
+        rows.append(row)
+    # Best configurations first
+    rows.sort(key=lambda row: (-row['FramesWithRef'], row['IdSwitches'], row['MedianFrameCost']))
+    printTable(rows)
+
+    if 'SaveIn' in sweep:
+        with open(sweep['SaveIn'], 'w') as f:
+            yaml.dump(rows, f, sort_keys=False)
+        cprint.ok(f'Comparison table written in {sweep["SaveIn"]}!')
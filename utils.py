@@ -80,27 +80,53 @@ def computeWError(coords, im_width):
     return w_error
 
 
+def sampleDepths(boxes, depth, padding=0.1, grid=10, stat='median', trim=0.2):
+    """Robust depth of several [x, y, w, h] boxes at once, sampling a grid x grid mesh
+    inside each box (with an inner padding ratio) on a float32 depth image. The
+    statistic is the median or the trimmed mean of the valid (non-nan) samples.
+    Return nan for the boxes without any valid sample."""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    depth = np.asarray(depth, dtype=np.float32)
+    im_h, im_w = depth.shape[:2]
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    # Padded boxes, inside the image
+    x1 = np.clip(boxes[:, 0] + padding * boxes[:, 2], 0, im_w - 1)
+    y1 = np.clip(boxes[:, 1] + padding * boxes[:, 3], 0, im_h - 1)
+    x2 = np.clip(boxes[:, 0] + (1 - padding) * boxes[:, 2], 0, im_w - 1)
+    y2 = np.clip(boxes[:, 1] + (1 - padding) * boxes[:, 3], 0, im_h - 1)
+    steps = np.linspace(0, 1, grid, dtype=np.float32)
+    rows = (y1[:, None] + steps[None, :] * (y2 - y1)[:, None]).astype(int)
+    cols = (x1[:, None] + steps[None, :] * (x2 - x1)[:, None]).astype(int)
+    samples = depth[rows[:, :, None], cols[:, None, :]].reshape(len(boxes), -1)
+    samples[samples <= 0] = np.nan  # no reading
+    samples[(x2 <= x1) | (y2 <= y1)] = np.nan  # empty boxes
+
+    valid = np.count_nonzero(~np.isnan(samples), axis=1)
+    result = np.full(len(boxes), np.nan, dtype=np.float32)
+    if stat == 'median':
+        result[valid > 0] = np.nanmedian(samples[valid > 0], axis=1)
+    else:
+        # Mean of the sorted valid samples (nans go last), discarding a trim ratio on each side
+        ordered = np.sort(samples, axis=1)
+        low = np.floor(trim * valid).astype(int)
+        pos = np.arange(samples.shape[1])[None, :]
+        kept = (pos >= low[:, None]) & (pos < (valid - low)[:, None])
+        sums = np.where(kept, ordered, 0).sum(axis=1)
+        counts = kept.sum(axis=1)
+        result[counts > 0] = sums[counts > 0] / counts[counts > 0]
+    return result
+
+
 def computeXError(coords, depth):
     """Compute the depth error, sampling the depth image inside the detected box."""
-
-    # Crop the depth from the person with inner padding of 10%
-    coords = np.array(coords, dtype=np.int)
-    bb_depth = depth[coords[1]:coords[1]+coords[3], coords[0]:coords[0]+coords[2]]
-    ph, pw = bb_depth.shape
-    cropped_depth = bb_depth[ph//10:-ph//10, pw//10:-pw//10]
-    # Create a 10x10 mesh to sample the depth values
-    vg = np.linspace(0, cropped_depth.shape[0]-1, num=10, dtype=np.int)
-    hg = np.linspace(0, cropped_depth.shape[1]-1, num=10, dtype=np.int)
-    grid = np.meshgrid(vg, hg)
-
-    # Sample the values and compute the median depth
-    sampled_depths = cropped_depth[tuple(grid)].ravel()
-    median = np.nanmedian(sampled_depths)
+    median = sampleDepths([coords[:4]], depth)[0]
     if np.isnan(median):
         # The person is too close to estimate the distance
         # We report 0 distance
         return 0.0
-    return median
+    return float(median)
 
 
 def arrowColor(rate):